@@ -0,0 +1,93 @@
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import time
+
+from . import load, micro, startup
+
+
+def environment():
+    import hej
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'hej': hej.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(baseline, current):
+    rows = []
+    for suite, key in (('micro', 'best'), ('startup', 'median'), ('load', 'p50'), ('load', 'p99')):
+        for name, result in sorted(current.get(suite, {}).items()):
+            before = baseline.get(suite, {}).get(name)
+            if before and before.get(key) and result.get(key):
+                rows.append((f'{suite}.{name}.{key}', before[key], result[key], result[key] / before[key]))
+    for name, before, after, ratio in rows:
+        print(f'{name:<50} {before:>12.6f} {after:>12.6f} {ratio:>7.2f}x')
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run Hej benchmarks')
+    parser.add_argument('suite', nargs='?', choices=('all', 'micro', 'startup', 'load', 'compare'), default='all')
+    parser.add_argument('files', nargs='*', help='baseline and current result files for compare')
+    parser.add_argument('-o', '--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--import-budget', type=float, default=startup.IMPORT_BUDGET,
+                        help='fail when the median import time in seconds exceeds this')
+    parser.add_argument('--engine', choices=('threads', 'asyncio'), default='threads')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--no-keep-alive', dest='keep_alive', action='store_false')
+    parser.add_argument('--url', help='drive an already running server instead of starting one, e.g. http://127.0.0.1:5000/')
+    args = parser.parse_args(argv)
+
+    if args.suite == 'compare':
+        if len(args.files) != 2:
+            parser.error('compare needs a baseline and a current result file')
+        with open(args.files[0]) as f:
+            baseline = json.load(f)
+        with open(args.files[1]) as f:
+            current = json.load(f)
+        compare(baseline, current)
+        return
+
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if not all(result['within_budget'] for result in results.get('startup', {}).values()):
+        print(f'Import time exceeds the {args.import_budget}s budget', file=sys.stderr)
+        return 1
+
+
+def run(args):
+    results = {'environment': environment()}
+    if args.suite in ('all', 'micro'):
+        results['micro'] = micro.run_all(args.min_time, args.repeat)
+    if args.suite in ('all', 'startup'):
+        results['startup'] = startup.run_all(max(args.repeat, 10), args.import_budget)
+    if args.suite in ('all', 'load'):
+        if args.url:
+            from urllib.parse import urlsplit
+            url = urlsplit(args.url)
+            results['load'] = {url.path or '/': load.run_load(url.hostname, url.port or 80, url.path or '/', args.requests,
+                                                              args.concurrency, args.keep_alive)}
+        else:
+            results['load'] = load.run_all(args.engine, args.threads, args.requests, args.concurrency, args.keep_alive)
+        results['environment'].update(engine=args.engine, threads=args.threads)
+    return results
+
+
+if __name__ == '__main__':
+    sys.exit(main())
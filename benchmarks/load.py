@@ -0,0 +1,95 @@
+import http.client
+import threading
+import time
+
+from hej.html import html
+
+from .micro import dispatch_app
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * (len(values) - 1)))))
+    return values[index]
+
+
+def start_app(engine='threads', threads=8):
+    app = dispatch_app()
+
+    @app.get('/page')
+    def page():
+        return html.ul(*[html.li(f'row {i}') for i in range(200)])
+
+    thread = threading.Thread(target=app.run, kwargs={'host': '127.0.0.1', 'port': 0, 'threads': threads,
+                                                      'engine': engine}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while app.server is None:
+        if time.monotonic() > deadline:
+            raise RuntimeError('Server did not start')
+        time.sleep(0.01)
+    return app, app.server.server_address[1]
+
+
+def client(host, port, path, count, keep_alive, latencies, errors):
+    connection = None
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(host, port, timeout=10)
+            connection.request('GET', path, headers={} if keep_alive else {'Connection': 'close'})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+            if not keep_alive or response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            if connection is not None:
+                connection.close()
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - started)
+    if connection is not None:
+        connection.close()
+
+
+def run_load(host, port, path='/', requests=2000, concurrency=16, keep_alive=True):
+    per_client = max(1, requests // concurrency)
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(host, port, path, per_client, keep_alive, latencies, errors))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'keep_alive': keep_alive,
+        'elapsed': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed else None,
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else None,
+    }
+
+
+def run_all(engine='threads', threads=8, requests=2000, concurrency=16, keep_alive=True, paths=('/users/42', '/page')):
+    app, port = start_app(engine, threads)
+    try:
+        run_load('127.0.0.1', port, paths[0], min(requests, 200), concurrency, keep_alive)
+        return {path: run_load('127.0.0.1', port, path, requests, concurrency, keep_alive) for path in paths}
+    finally:
+        app.server.shutdown()
+        app.server.server_close()
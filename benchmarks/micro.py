@@ -0,0 +1,116 @@
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+from hej.app import App
+from hej.html import CSSBuilder, css, html
+from hej.server import ThreadPoolServer
+
+
+def measure(func, min_time=0.2, repeat=5):
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        'iterations': number * repeat,
+        'best': min(timings),
+        'median': statistics.median(timings),
+        'ops_per_sec': 1 / min(timings),
+    }
+
+
+def deep_tree(depth=200):
+    node = html.span('leaf & <text>')
+    for i in range(depth):
+        node = html.div(node, cls=f'level-{i}')
+    return node
+
+
+def wide_tree(width=5000):
+    return html.ul(*[html.li(html.a(f'item {i}', href=f'/items/{i}'), cls='row') for i in range(width)])
+
+
+def css_blocks(rules=500):
+    return [css.card__hover(color='#333', padding=f'{i}px', margin='0 auto') for i in range(rules)]
+
+
+def css_sheet(rules=500):
+    return CSSBuilder()(*css_blocks(rules))
+
+
+def template_source(keys=500):
+    return '<html><body>\n' + '\n'.join(f'<p>{{{{ key{i} }}}}</p>' for i in range(keys)) + '\n</body></html>'
+
+
+def dispatch_app():
+    app = App()
+    app.reload_enabled = False
+
+    @app.get('/users/<int:user_id>')
+    def user(user_id):
+        return html.div(html.h1(f'User {user_id}'), html.p('profile'), cls='user')
+
+    for i in range(50):
+        app.get(f'/static-route-{i}')(lambda: 'ok')
+    return app
+
+
+def request_once(server, handler, request):
+    client, peer = socket.socketpair()
+    try:
+        client.sendall(request)
+        client.shutdown(socket.SHUT_WR)
+        handler(peer, ('127.0.0.1', 0), server)
+        peer.close()
+        response = b''
+        while True:
+            data = client.recv(65536)
+            if not data:
+                return response
+            response += data
+    finally:
+        client.close()
+        peer.close()
+
+
+def run_all(min_time=0.2, repeat=5):
+    deep, wide, blocks = deep_tree(), wide_tree(), css_blocks()
+    results = {
+        'html_deep_tree_str': measure(lambda: str(deep), min_time, repeat),
+        'html_wide_tree_str': measure(lambda: str(wide), min_time, repeat),
+        'html_wide_tree_build': measure(lambda: wide_tree(), min_time, repeat),
+        'css_sheet_compose': measure(lambda: css_sheet(), min_time, repeat),
+        'css_sheet_str': measure(lambda: str(CSSBuilder()(*blocks)), min_time, repeat),
+    }
+
+    context = {f'key{i}': i for i in range(500)}
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'page.html'), 'w') as f:
+            f.write(template_source())
+        app = App(template_dir=directory)
+        results['template_render_many_keys'] = measure(lambda: app.render_template('page.html', context), min_time, repeat)
+
+    app = dispatch_app()
+    from hej.handler import Handler
+    handler = type('Handler', (Handler,), {'app': app, 'debug': False, 'timeout': None, 'disable_nagle_algorithm': False})
+    server = ThreadPoolServer(('127.0.0.1', 0), handler, bind_and_activate=False)
+    try:
+        request = b'GET /users/42 HTTP/1.1\r\nHost: bench\r\n\r\n'
+        results['handle_request_dispatch'] = measure(lambda: request_once(server, handler, request), min_time, repeat)
+    finally:
+        server.socket.close()
+    return results
@@ -0,0 +1,44 @@
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_BUDGET = 0.05
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNIPPET = 'import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)'
+
+
+def python(*args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    return subprocess.run([sys.executable] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, env=env, check=True)
+
+
+def measure_import(module='hej', repeat=10):
+    timings = [float(python('-c', SNIPPET.format(module=module)).stdout) for _ in range(repeat)]
+    return {
+        'iterations': repeat,
+        'best': min(timings),
+        'median': statistics.median(timings),
+    }
+
+
+def slowest_imports(module='hej', top=10):
+    rows = []
+    for line in python('-X', 'importtime', '-c', f'import {module}').stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[0].startswith('import time:') and parts[1].strip().isdigit():
+            rows.append((int(parts[0].split(':')[1]), int(parts[1]), parts[2].strip()))
+    rows.sort(reverse=True)
+    return [{'module': name, 'self': own / 1e6, 'cumulative': cumulative / 1e6} for own, cumulative, name in rows[:top]]
+
+
+def run_all(repeat=10, budget=IMPORT_BUDGET):
+    results = {}
+    for module in ('hej', 'hej.cli'):
+        result = measure_import(module, repeat)
+        result['budget'] = budget
+        result['within_budget'] = result['median'] <= budget
+        result['slowest'] = slowest_imports(module)
+        results[f'import_{module.replace(".", "_")}'] = result
+    return results
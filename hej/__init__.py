@@ -5,17 +5,22 @@ import sys
 import builtins
 from .app import App
 from .html import html, css
+from .request import Request, RequestError, RequestTooLarge
+from .response import Response, JSONResponse, FileResponse, StreamingResponse
+from .tasks import TaskQueueFull
 
 app = App()
 
-def get(path: str):
-    return app.get(path)
+def get(path: str, cache: float = None, vary=(), timeout: float = None):
+    return app.get(path, cache=cache, vary=vary, timeout=timeout)
 
 def not_found(func):
     return app.not_found(func)
 
-def run(host='127.0.0.1', port=5000, debug=False):
-    app.run(host=host, port=port, debug=debug)
+def run(host='127.0.0.1', port=5000, debug=False, threads=8, request_queue_size=128, workers=1, reuse_port=False,
+        engine='threads'):
+    app.run(host=host, port=port, debug=debug, threads=threads, request_queue_size=request_queue_size,
+            workers=workers, reuse_port=reuse_port, engine=engine)
 
 def template(name: str, context: dict = None):
     return app.render_template(name, context)
@@ -29,5 +34,6 @@ builtins.template = template
 current_module = sys.modules[__name__]
 current_module.run = run
 
-__all__ = ['get', 'not_found', 'run', 'app', 'App', 'html', 'css', 'template']
+__all__ = ['get', 'not_found', 'run', 'app', 'App', 'html', 'css', 'template', 'Request', 'RequestError',
+           'RequestTooLarge', 'Response', 'JSONResponse', 'FileResponse', 'StreamingResponse', 'TaskQueueFull']
 
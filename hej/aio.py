@@ -0,0 +1,506 @@
+import asyncio
+import functools
+import inspect
+import io
+import itertools
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from .compression import compress_stream
+
+from .metrics import debug_flag, errors_enabled
+from .overload import HandlerTimeout
+from .request import CHUNK_SIZE, BodyReader, RequestError, RequestTooLarge
+from .response import FileResponse, StreamingResponse
+from .static import StaticFiles, open_file
+
+
+class AsyncServer:
+    max_headers = 100
+
+    def __init__(self, server_address, app, debug=False, threads=8, request_queue_size=128, reuse_port=False, sock=None):
+        self.app = app
+        self.debug = debug
+        self.threads = max(1, int(threads))
+        self.socket = sock
+        if sock is None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            try:
+                self.socket.bind(server_address)
+                self.socket.listen(request_queue_size)
+            except OSError:
+                self.socket.close()
+                raise
+        self.server_address = self.socket.getsockname()
+        self._loop = None
+        self._stop = None
+        self._executor = None
+        self._slots = None
+        self._idle = set()
+        self._connections = set()
+        self._shutdown_request = False
+        self._finished = threading.Event()
+        self._drained = True
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    def shutdown(self):
+        self._shutdown_request = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def drain(self, timeout=None):
+        if not self._finished.is_set():
+            self.shutdown()
+        return self._loop is None or (self._finished.wait(timeout) and self._drained)
+
+    def server_close(self):
+        self.socket.close()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if self._shutdown_request:
+            self._finished.set()
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='hej-worker')
+        if self.app.max_in_flight:
+            self._slots = asyncio.Semaphore(self.app.max_in_flight)
+        try:
+            listener = self.socket.dup()
+            listener.setblocking(False)
+            server = await asyncio.start_server(self._handle, sock=listener)
+            async with server:
+                await self._stop.wait()
+                server.close()
+                for writer in list(self._idle):
+                    writer.close()
+                deadline = self._loop.time() + self.app.graceful_timeout
+                while self._connections and self._loop.time() < deadline:
+                    await asyncio.wait(list(self._connections), timeout=deadline - self._loop.time())
+                self._drained = not self._connections
+        finally:
+            self._executor.shutdown(wait=False)
+            self._finished.set()
+
+    async def _call(self, func):
+        if inspect.iscoroutinefunction(func):
+            result = await func()
+        else:
+            result = await self._loop.run_in_executor(self._executor, func)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _join(self, result, complete=False):
+        response = self.app.make_response(result)
+        response.prepare(float('inf') if complete else self.app.stream_threshold)
+        return response
+
+    async def _render(self, result, complete=False):
+        return await self._loop.run_in_executor(self._executor, self._join, result, complete)
+
+    def _call_and_join(self, func, complete=False):
+        result = func()
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        return self._join(result, complete)
+
+    async def _deadline(self, awaitable, timeout):
+        if not timeout:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise HandlerTimeout(f'Handler exceeded its {timeout}s deadline')
+
+    async def _run(self, handler, timing, timeout=None, complete=False):
+        profiler = self.app.profiler
+        route = timing['route']
+        sync = not inspect.iscoroutinefunction(handler)
+        if profiler is not None and sync and profiler.wants(route):
+            call = functools.partial(profiler.run, route, self._call_and_join, handler, complete)
+            started = time.perf_counter()
+            if timeout:
+                call = functools.partial(self.app.call_with_deadline, timeout, call)
+            body = await self._loop.run_in_executor(self._executor, call)
+            timing['handler'] = time.perf_counter() - started
+            return body
+        started = time.perf_counter()
+        if sync and timeout:
+            result = await self._call(functools.partial(self.app.call_with_deadline, timeout, handler))
+        else:
+            result = await self._deadline(self._call(handler), timeout)
+        rendered = time.perf_counter()
+        timing['handler'] = rendered - started
+        body = await self._render(result, complete)
+        timing['render'] = time.perf_counter() - rendered
+        return body
+
+    async def _run_safely(self, handler, timing, timeout, target, complete=False):
+        try:
+            return await self._run(handler, timing, timeout, complete), None
+        except RequestError:
+            raise
+        except HandlerTimeout as e:
+            self.app.record_shed('handler_timeout')
+            self._log_error(f'"{target}" {e}')
+            return None, 504
+        except Exception:
+            self._log_error(f'"{target}" raised:\n{traceback.format_exc()}')
+            return None, 500
+
+    def _timed(self, awaitable, timeout=None):
+        return asyncio.wait_for(awaitable, timeout or self.app.keep_alive_timeout)
+
+    async def _admit(self):
+        if self._slots is None:
+            return True
+        if self._slots.locked():
+            if not self.app.max_queue_wait:
+                self.app.record_shed('in_flight')
+                return False
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.app.max_queue_wait)
+            except asyncio.TimeoutError:
+                self.app.record_shed('in_flight')
+                return False
+        else:
+            await self._slots.acquire()
+        self.app.admission.admit()
+        return True
+
+    def _release(self):
+        if self._slots is not None:
+            self.app.admission.release()
+            self._slots.release()
+
+    async def _read_request(self, reader, writer, method, target, headers, version):
+        request = self.app.make_request(method, target, headers, None)
+        length = request.content_length
+        if length == 0:
+            request.stream = BodyReader(io.BytesIO())
+            return request
+        if version == 'HTTP/1.1' and headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        limit = self.app.max_body_size
+        body = tempfile.SpooledTemporaryFile(max_size=self.app.max_memory_size)
+        size = 0
+        try:
+            while True:
+                if length is None:
+                    line = await self._timed(reader.readline())
+                    try:
+                        chunk_size = int(line.split(b';', 1)[0].strip(), 16)
+                    except ValueError:
+                        raise RequestError('Malformed chunked body')
+                    if chunk_size == 0:
+                        while (await self._timed(reader.readline())) not in (b'\r\n', b'\n', b''):
+                            pass
+                        break
+                else:
+                    chunk_size = min(CHUNK_SIZE, length - size)
+                    if chunk_size == 0:
+                        break
+                size += chunk_size
+                if limit is not None and size > limit:
+                    raise RequestTooLarge(f'Request body exceeds {limit} bytes')
+                body.write(await self._timed(reader.readexactly(chunk_size)))
+                if length is None:
+                    await self._timed(reader.readline())
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+        request.stream = BodyReader(body, size, max_size=limit)
+        return request
+
+    async def _dispatch(self, method, target, headers, timing, request=None):
+        url = urllib.parse.urlsplit(target)
+        admin = self.app.admin_response(method, url.path, url.query)
+        if admin is not None:
+            timing['route'] = url.path
+            return self._cached(admin, headers)
+        match = self.app.resolve(method, url.path)
+        timing['route'] = match.pattern
+        if match.handler is None:
+            if match.allowed:
+                return 405, b'Method Not Allowed', {'Allow': ', '.join(match.allowed)}
+            return self._encoded(404, await self._not_found_body(), headers)
+        params = self.app.handler_kwargs(match, request)
+        handler = functools.partial(match.handler, **params) if params else match.handler
+        timeout = self.app.handler_deadline(match)
+        policy = self.app.cache_policies.get((match.method, match.pattern))
+        if policy is not None:
+            key = self.app.cache_key(url.path, url.query, policy[1])
+            entry = self.app.response_cache.get(key)
+            if entry is None:
+                response, error = await self._run_safely(handler, timing, timeout, target, complete=True)
+                if error:
+                    return self._encoded(error, HTTPStatus(error).phrase.encode(), headers)
+                body = self.app.cacheable_body(response)
+                if body is None:
+                    return self._response(response, headers)
+                entry = self.app.response_cache.set(key, body, policy[0], response.content_type)
+            return self._cached(entry, headers)
+        response, error = await self._run_safely(handler, timing, timeout, target)
+        if error:
+            return self._encoded(error, HTTPStatus(error).phrase.encode(), headers)
+        return self._response(response, headers)
+
+    def _response(self, response, headers):
+        if isinstance(response, FileResponse):
+            return response
+        if isinstance(response, StreamingResponse) and not response.complete:
+            return response
+        body = b''.join(response.buffered) if isinstance(response, StreamingResponse) else response.body
+        extra = dict(response.headers)
+        if response.content_type != 'text/html':
+            extra['Content-Type'] = response.content_type
+        return self._encoded(response.status, body, headers, extra, response.content_type)
+
+    def _cached(self, entry, headers):
+        status, body, extra = self.app.cached_response(entry, headers)
+        if status == 200:
+            extra['Content-Type'] = entry.content_type
+        return status, body, extra
+
+    def _encoded(self, status, body, headers, extra=None, content_type='text/html'):
+        body, extra = self.app.compress_body(body, content_type, headers.get('accept-encoding'), headers=extra)
+        return status, body, extra
+
+    async def _not_found_body(self):
+        if self.app.not_found_handler:
+            try:
+                return str(await self._call(self.app.not_found_handler)).encode()
+            except Exception:
+                self._log_error(f'not_found handler raised:\n{traceback.format_exc()}')
+        return b'Not Found'
+
+    async def _read_head(self, reader, first):
+        request_line = (first + await reader.readline()).decode('latin-1').rstrip('\r\n')
+        parts = request_line.split()
+        headers = await self._read_headers(reader) if len(parts) == 3 else None
+        return request_line, parts, headers
+
+    async def _read_headers(self, reader):
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            if len(headers) >= self.max_headers:
+                return None
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def _send_static(self, writer, files, relpath, method, headers, keep_alive):
+        f, static = files.open(relpath)
+        return await self._send_open_file(writer, f, static, method, headers, keep_alive)
+
+    async def _send_file(self, writer, response, method, headers, keep_alive):
+        f, static = open_file(response.path, response.cache_control, response.content_type)
+        return await self._send_open_file(writer, f, static, method, headers, keep_alive, response.headers)
+
+    async def _send_open_file(self, writer, f, static, method, headers, keep_alive, response_headers=None):
+        if f is None:
+            body = await self._not_found_body()
+            self._write_response(writer, 404, body, method, keep_alive)
+            return 404, len(body)
+        with f:
+            encoding, vary = None, False
+            if static.size <= self.app.max_compressed_static_size and not headers.get('range'):
+                encoding, vary = self.app.choose_encoding(static.size, static.content_type, headers.get('accept-encoding'))
+            status, offset, length, extra = StaticFiles.prepare(static, headers, encoding, vary)
+            if response_headers:
+                extra.update(response_headers)
+            if encoding and status == 200:
+                body = self.app.compression_cache.get(static.etag, encoding, f.read, self.app.compress_level)
+                self._write_response(writer, status, body, method, keep_alive, extra, static.content_type)
+                return status, 0 if method == 'HEAD' else len(body)
+            self._write_response(writer, status, b'', method, keep_alive, extra, static.content_type, length)
+            if method != 'HEAD' and length and status != 304:
+                await self._timed(writer.drain(), self.app.write_timeout)
+                return status, await self._loop.sendfile(writer.transport, f, offset, length)
+        return status, 0
+
+    def _head(self, status, keep_alive, headers, content_type, length):
+        head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+        if status != 304:
+            if not headers or 'Content-Type' not in headers:
+                head.append(f'Content-Type: {content_type}')
+            if length is not None:
+                head.append(f'Content-Length: {length}')
+        if headers:
+            head.extend(f'{name}: {value}' for name, value in headers.items())
+        head.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+
+    def _write_response(self, writer, status, body, method, keep_alive, headers=None, content_type='text/html',
+                        length=None):
+        head = self._head(status, keep_alive, headers, content_type, len(body) if length is None else length)
+        writer.write(head + body if method != 'HEAD' and body else head)
+
+    async def _send_stream(self, writer, response, method, headers, keep_alive, chunked):
+        chunks = itertools.chain(response.buffered, response.chunks)
+        encoding, extra = self.app.response_encoding(self.app.stream_threshold, response.content_type,
+                                                     headers.get('accept-encoding'), response.headers)
+        if encoding:
+            chunks = compress_stream(chunks, encoding, self.app.compress_level)
+        if chunked:
+            extra['Transfer-Encoding'] = 'chunked'
+        writer.write(self._head(response.status, keep_alive, extra, response.content_type, None))
+        if method == 'HEAD':
+            return 0, True
+        nbytes = 0
+        try:
+            while True:
+                chunk = await self._loop.run_in_executor(self._executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if not chunk:
+                    continue
+                nbytes += len(chunk)
+                writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                await self._timed(writer.drain(), self.app.write_timeout)
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+        except (ConnectionError, asyncio.TimeoutError):
+            return nbytes, False
+        except Exception:
+            self._log_error(f'Streaming response raised:\n{traceback.format_exc()}')
+            return nbytes, False
+        return nbytes, True
+
+    def _log(self, peer, request_line, status):
+        if debug_flag(self.debug, 'log_requests'):
+            stamp = time.strftime('%d/%b/%Y %H:%M:%S')
+            sys.stderr.write(f'{peer[0] if peer else "-"} - - [{stamp}] "{request_line}" {status} -\n')
+
+    def _log_error(self, message):
+        if errors_enabled(self.debug):
+            sys.stderr.write(message.rstrip('\n') + '\n')
+
+    def _record(self, method, request_line, status, nbytes, timing, elapsed):
+        handler_time, render_time = timing['handler'], timing['render']
+        write_time = elapsed - handler_time - render_time
+        if self.app.metrics is not None:
+            self.app.metrics.record(method, timing['route'], status, nbytes, handler_time, render_time, write_time)
+        if debug_flag(self.debug, 'log_timing', False):
+            sys.stderr.write(f'"{request_line}" {status} handler={handler_time * 1000:.2f}ms '
+                             f'render={render_time * 1000:.2f}ms write={write_time * 1000:.2f}ms\n')
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        sock = writer.get_extra_info('socket')
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        handled = 0
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                if handled:
+                    if self._stop.is_set():
+                        break
+                    self._idle.add(writer)
+                try:
+                    first = await asyncio.wait_for(reader.read(1), self.app.keep_alive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                finally:
+                    self._idle.discard(writer)
+                if not first:
+                    break
+                try:
+                    request_line, parts, headers = await self._timed(self._read_head(reader, first),
+                                                                     self.app.header_timeout)
+                except asyncio.TimeoutError:
+                    self.app.record_shed('header_timeout')
+                    break
+                if headers is None:
+                    self._write_response(writer, 400, b'Bad Request', 'GET', False)
+                    self._log(peer, request_line, 400)
+                    break
+                method, target, version = parts
+                try:
+                    request = await self._read_request(reader, writer, method, target, headers, version)
+                except RequestError as e:
+                    self._write_response(writer, e.status, str(e).encode(), method, False, None,
+                                         'text/plain; charset=utf-8')
+                    self._log(peer, request_line, e.status)
+                    break
+                handled += 1
+                connection = headers.get('connection', '').lower()
+                if handled >= self.app.max_keep_alive_requests:
+                    keep_alive = False
+                elif version == 'HTTP/1.1':
+                    keep_alive = connection != 'close'
+                else:
+                    keep_alive = connection == 'keep-alive'
+                if self._stop.is_set():
+                    keep_alive = False
+                started = time.perf_counter()
+                timing = {'route': None, 'handler': 0.0, 'render': 0.0}
+                path = urllib.parse.urlsplit(target).path
+                static = self.app.find_static(method, path)
+                admitted = await self._admit()
+                try:
+                    if not admitted:
+                        keep_alive = False
+                        status, body = 503, b'Service Unavailable'
+                        self._write_response(writer, status, body, method, keep_alive,
+                                             {'Retry-After': str(self.app.retry_after)}, 'text/plain; charset=utf-8')
+                        nbytes = 0 if method == 'HEAD' else len(body)
+                    elif static is not None:
+                        timing['route'] = path[:len(path) - len(static[1])] + '*'
+                        status, nbytes = await self._send_static(writer, *static, method, headers, keep_alive)
+                    else:
+                        try:
+                            result = await self._dispatch(method, target, headers, timing, request)
+                        except RequestError as e:
+                            result = e.status, str(e).encode(), {'Content-Type': 'text/plain; charset=utf-8'}
+                        if isinstance(result, FileResponse):
+                            status, nbytes = await self._send_file(writer, result, method, headers, keep_alive)
+                        elif isinstance(result, StreamingResponse):
+                            chunked = version == 'HTTP/1.1'
+                            keep_alive = keep_alive and chunked
+                            status = result.status
+                            nbytes, streamed = await self._send_stream(writer, result, method, headers, keep_alive,
+                                                                       chunked)
+                            keep_alive = keep_alive and streamed
+                        else:
+                            status, body, extra = result
+                            if status == 504:
+                                keep_alive = False
+                            self._write_response(writer, status, body, method, keep_alive, extra)
+                            nbytes = 0 if method == 'HEAD' else len(body)
+                finally:
+                    if admitted:
+                        self._release()
+                    request.finish(0)
+                    request.stream.stream.close()
+                await self._timed(writer.drain(), self.app.write_timeout)
+                if request.tasks:
+                    self.app.run_after_response(request)
+                self._log(peer, request_line, status)
+                self._record(method, request_line, status, nbytes, timing, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.TimeoutError:
+            writer.transport.abort()
+        finally:
+            self._connections.discard(task)
+            writer.close()
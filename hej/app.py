@@ -1,76 +1,24 @@
-import http.server
-import socketserver
+import errno
 import threading
+import time
 import urllib.parse
 import os
-import time
 import json
-import sys
-import glob
-import ast
-import runpy
-from typing import Callable, Dict, Any
-
-class App:
-    def __init__(self):
-        self.routes = {}
-        self.server = None
-        self.not_found_handler = None
-        self.swagger_enabled = True
-
-    def route(self, path: str, methods=None):
-        if methods is None:
-            methods = ['GET']
-
-        def decorator(func: Callable):
-            for method in methods:
-                self.routes[(method, path)] = func
-            return func
-        return decorator
-
-    def get(self, path: str):
-        return self.route(path, ['GET'])
-
-    def not_found(self, func: Callable):
-        self.not_found_handler = func
-        return func
-
-    def render_template(self, template_name: str, context: dict = None):
-        context = context or {}
-        with open(os.path.join(os.path.dirname(__file__), '..', 'templates', template_name)) as f:
-            template = f.read()
-        for k, v in context.items():
-            template = template.replace('{{ ' + k + ' }}', str(v))
-        return template
-
-    def generate_openapi_spec(self):
-        paths = {}
-        for (method, path), handler in self.routes.items():
-            if path not in paths:
-                paths[path] = {}
-            paths[path][method.lower()] = {
-                'responses': {
-                    '200': {
-                        'description': 'Successful response'
-                    }
-                }
-            }
-
-        return {
-            'openapi': '3.0.0',
-            'info': {
-                'title': 'Hej API',
-                'version': '1.0.0',
-                'description': 'Automatically generated API documentation'
-            },
-            'paths': paths
-        }
-
-    def serve_swagger_ui(self):
-        spec = self.generate_openapi_spec()
-        spec_json = json.dumps(spec)
-
-        return f"""
+from collections.abc import Callable
+from .templates import TemplateLoader
+from .cache import CachedResponse, ResponseCache, etag_matches
+from .compression import CompressionCache, add_vary, compress, is_compressible, negotiate, variant_etag
+from .routing import Router, openapi_path
+from .response import JSON_ENCODER, FileResponse, JSONResponse, Response, StreamingResponse
+from .request import Request
+from .metrics import Metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE, debug_flag
+from .overload import Admission, HandlerTimeout
+from .stylesheet import URL_PREFIX as STYLESHEET_PREFIX, stylesheets
+from .html import HTMLElement
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'templates')
+
+SWAGGER_UI = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -97,9 +45,8 @@ class App:
     <script src="https://unpkg.com/swagger-ui-dist@5.10.3/swagger-ui-standalone-preset.js"></script>
     <script>
         window.onload = function() {{
-            const spec = {spec_json};
             const ui = SwaggerUIBundle({{
-                spec: spec,
+                url: '{spec_url}',
                 dom_id: '#swagger-ui',
                 deepLinking: true,
                 presets: [
@@ -117,295 +64,525 @@ class App:
 </html>
 """
 
-    def run(self, host='0.0.0.0', port=5000, debug=False):
-        if self.swagger_enabled and ('GET', '/swagger') not in self.routes:
-            self.routes[('GET', '/swagger')] = self.serve_swagger_ui
-
-        class Handler(http.server.BaseHTTPRequestHandler):
-            def __init__(self, *args, app=None, **kwargs):
-                self.app = app
-                super().__init__(*args, **kwargs)
-
-            def handle_request(self, method):
-                path = urllib.parse.urlparse(self.path).path
-                if (method, path) in self.app.routes:
-                    try:
-                        result = self.app.routes[(method, path)]()
-                        if isinstance(result, tuple) and len(result) == 2:
-                            result = self.app.render_template(*result)
-                        elif isinstance(result, str) and result.endswith('.html'):
-                            result = self.app.render_template(result)
-                        result_str = str(result)
-                        self.send_response(200)
-                        self.send_header('Content-type', 'text/html')
-                        self.end_headers()
-                        if method != 'HEAD':
-                            self.wfile.write(result_str.encode())
-                    except:
-                        self.send_response(500)
-                        self.end_headers()
-                        if method != 'HEAD':
-                            self.wfile.write(b'Internal Server Error')
-                else:
-                    self.send_response(404)
-                    self.send_header('Content-type', 'text/html')
-                    self.end_headers()
-                    if self.app.not_found_handler:
-                        try:
-                            result = self.app.not_found_handler()
-                            if method != 'HEAD':
-                                self.wfile.write(str(result).encode())
-                        except:
-                            if method != 'HEAD':
-                                self.wfile.write(b'Not Found')
-                    else:
-                        if method != 'HEAD':
-                            self.wfile.write(b'Not Found')
-            def log_message(self, format, *args):
-                if debug:
-                    super().log_message(format, *args)
-            do_GET = lambda self: self.handle_request('GET')
-            do_POST = lambda self: self.handle_request('POST')
-            do_PUT = lambda self: self.handle_request('PUT')
-            do_DELETE = lambda self: self.handle_request('DELETE')
-            do_HEAD = lambda self: self.handle_request('HEAD')
-
-        def run_server():
-            socketserver.TCPServer.allow_reuse_address = True
-            try:
-                self.server = socketserver.TCPServer((host, port), lambda *args, **kwargs: Handler(*args, app=self, **kwargs))
-                print(f'Server running on http://{host}:{port}')
-                self.server.serve_forever()
-            except OSError as e:
-                if e.errno == 48:
-                    print(f'Port {port} is already in use. Try a different port or kill existing processes.')
-                else:
-                    print(f'Error starting server: {e}')
-                return
-
-        server_thread = threading.Thread(target=run_server, daemon=True)
-        server_thread.start()
-
-        try:
-            test_file = __import__('sys').argv[0]
-            templates_dir = os.path.join(os.path.dirname(__file__), '..', 'templates')
-
-            watch_file_changes = os.path.isfile(test_file)
-            mtime_test = 0
-            if watch_file_changes:
-                mtime_test = os.stat(test_file).st_mtime
-
-            mtime_templates = 0
-            if os.path.exists(templates_dir):
-                mtime_templates = max((os.stat(os.path.join(templates_dir, f)).st_mtime for f in os.listdir(templates_dir) if f.endswith('.html')), default=0)
-            while True:
-                time.sleep(1)
-                current_mtime_templates = 0
-                if os.path.exists(templates_dir):
-                    current_mtime_templates = max((os.stat(os.path.join(templates_dir, f)).st_mtime for f in os.listdir(templates_dir) if f.endswith('.html')), default=0)
-
-                file_changed = False
-                if watch_file_changes:
-                    current_mtime_test = os.stat(test_file).st_mtime
-                    file_changed = current_mtime_test != mtime_test
-                    mtime_test = current_mtime_test
-
-                if file_changed or current_mtime_templates != mtime_templates:
-                    print('Files changed, restarting...')
-                    if self.server:
-                        self.server.shutdown()
-                    server_thread.join()
-                    return self.run(host, port, debug)
-        except KeyboardInterrupt:
-            if self.server:
-                self.server.shutdown()
-            print('Server stopped')
-
-
-def find_hej_app_files():
-    candidates = [
-        'app.py', 'main.py', 'server.py', 'application.py',
-        'test.py', 'run.py', 'index.py', 'start.py'
-    ]
-
-    for candidate in candidates:
-        if os.path.isfile(candidate):
-            if has_hej_import_and_run(candidate):
-                return candidate
-
-    for py_file in glob.glob('*.py'):
-        if py_file not in ['__init__.py'] and has_hej_import_and_run(py_file):
-            return py_file
 
-    return None
-
-def has_hej_import_and_run(filename):
+def _accepts_request(func):
+    code = getattr(func, '__code__', None)
+    if code is not None and not hasattr(func, '__wrapped__'):
+        return 'request' in code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+    import inspect
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        tree = ast.parse(content)
-
-        has_hej_import = False
-        has_run_call = False
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    if alias.name == 'hej':
-                        has_hej_import = True
-            elif isinstance(node, ast.ImportFrom):
-                if node.module == 'hej':
-                    has_hej_import = True
-
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Attribute):
-                    if isinstance(node.func.value, ast.Name):
-                        if node.func.attr == 'run':
-                            has_run_call = True
-                elif isinstance(node.func, ast.Name) and node.func.id == 'run':
-                    has_run_call = True
-
-        return has_hej_import and has_run_call
-    except:
+        return 'request' in inspect.signature(func).parameters
+    except (TypeError, ValueError):
         return False
 
-def convert_flask_to_hej(content):
-    import re
-
-    lines = content.split('\n')
-    converted_lines = []
-    app_name = None
-    has_run_call = False
-
-    for line in lines:
-        original_line = line
-
-        if 'from flask import' in line or 'import flask' in line:
-            line = 'import hej'
-
-        elif 'app = Flask(' in line:
-            match = re.search(r'app\s*=\s*Flask\([^)]*\)', line)
-            if match:
-                app_name = 'app'
-                continue
-
-        elif re.search(r'\w+\s*=\s*Flask\([^)]*\)', line):
-            match = re.search(r'(\w+)\s*=\s*Flask\([^)]*\)', line)
-            if match:
-                app_name = match.group(1)
-                continue
-
-        elif '@app.route(' in line:
-            match = re.search(r'@app\.route\(([^)]+)\)', line)
-            if match:
-                route_args = match.group(1)
-                methods_match = re.search(r'methods\s*=\s*\[([^\]]+)\]', route_args)
-                if methods_match:
-                    methods = methods_match.group(1).replace("'", "").replace('"', "").split(',')
-                    method = methods[0].strip().upper()
-                    route_path = re.sub(r',\s*methods\s*=\s*\[.*\]', '', route_args)
-                else:
-                    method = 'GET'
-                    route_path = route_args
 
-                if method == 'GET':
-                    line = f'@get({route_path})'
-                else:
-                    line = f'@app.route({route_path}, methods=["{method}"])'
-
-        elif re.search(r'if\s+__name__\s*==\s*[\'"]__main__[\'"]\s*:', line):
-            converted_lines.append(line)
-            converted_lines.append('    hej.run()')
-            has_run_call = True
-            continue
-
-        elif 'app.run(' in line:
-            if not has_run_call:
-                line = '    hej.run()'
-                has_run_call = True
-            else:
-                continue
+def _operation_id(handler, method, seen):
+    name = getattr(handler, '__name__', None) or method.lower()
+    if name == '<lambda>':
+        name = method.lower()
+    candidate, suffix = name, 2
+    while candidate in seen:
+        candidate = f'{name}_{suffix}'
+        suffix += 1
+    seen.add(candidate)
+    return candidate
 
-        converted_lines.append(line)
 
-    result = '\n'.join(converted_lines)
+def _return_annotation(handler):
+    import inspect
+    import typing
+    try:
+        return typing.get_type_hints(handler).get('return')
+    except Exception:
+        pass
+    try:
+        annotation = inspect.signature(handler).return_annotation
+    except (TypeError, ValueError):
+        return None
+    return None if annotation is inspect.Signature.empty else annotation
+
+
+def _response_content(annotation):
+    from collections.abc import Iterator
+    kind = getattr(annotation, '__origin__', None) or annotation
+    if not isinstance(kind, type):
+        return None
+    if issubclass(kind, Response):
+        if kind.content_type is None:
+            return None
+        schema = {'type': 'object'} if kind.content_type == 'application/json' else {'type': 'string'}
+        return {kind.content_type: {'schema': schema}}
+    if issubclass(kind, dict):
+        return {'application/json': {'schema': {'type': 'object'}}}
+    if issubclass(kind, list):
+        return {'application/json': {'schema': {'type': 'array', 'items': {}}}}
+    if issubclass(kind, (str, bytes, bytearray, HTMLElement, Iterator)):
+        return {'text/html': {'schema': {'type': 'string'}}}
+    return None
 
-    if app_name and app_name != 'app':
-        result = result.replace(f'@{app_name}.route(', '@get(')
-        result = result.replace(f'{app_name}.run(', 'hej.run(')
 
-    if not has_run_call:
-        result += '\n\nif __name__ == \'__main__\':\n    hej.run()'
+def _request_body():
+    return {
+        'content': {
+            'application/json': {'schema': {}},
+            'application/x-www-form-urlencoded': {'schema': {'type': 'object'}},
+            'multipart/form-data': {'schema': {'type': 'object'}}
+        }
+    }
 
-    return result
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: hej <command> [options]")
-        print("Commands:")
-        print("  <filename>    Run a specific Python file")
-        print("  dev           Auto-detect and run Hej application")
-        print("  convert       Convert Flask app to Hej format")
-        print("  --version     Show version information")
-        sys.exit(1)
+class App:
+    def __init__(self, template_dir: str = None):
+        self.routes = {}
+        self.router = Router()
+        self._routes_lock = threading.RLock()
+        self.server = None
+        self.not_found_handler = None
+        self.swagger_enabled = True
+        self.swagger_path = '/swagger'
+        self.openapi_path = '/openapi.json'
+        self.openapi_info = {'title': 'Hej API', 'version': '1.0.0',
+                             'description': 'Automatically generated API documentation'}
+        self._openapi_document = None
+        self._swagger_page = None
+        self.reload_enabled = True
+        self.keep_alive_timeout = 5
+        self.max_keep_alive_requests = 100
+        self.stream_threshold = 64 * 1024
+        self.json_encoder = JSON_ENCODER
+        self.max_body_size = 16 * 1024 * 1024
+        self.max_memory_size = 1024 * 1024
+        self.max_form_parts = 1000
+        self.drain_limit = 64 * 1024
+        self.request_handlers = set()
+        self.templates = TemplateLoader(template_dir or DEFAULT_TEMPLATE_DIR)
+        self.cache_policies = {}
+        self.response_cache = ResponseCache()
+        self.static_mounts = []
+        self.compression_enabled = True
+        self.compress_min_size = 1024
+        self.compress_level = 6
+        self.max_compressed_static_size = 4 * 1024 * 1024
+        self.compression_cache = CompressionCache()
+        self.metrics = None
+        self.metrics_path = None
+        self.profiler = None
+        self.profile_path = None
+        self.max_in_flight = None
+        self.max_queue_wait = None
+        self.retry_after = 1
+        self.header_timeout = 10
+        self.write_timeout = 30
+        self.graceful_timeout = 30
+        self.handler_timeout = None
+        self.route_timeouts = {}
+        self.admission = Admission()
+        self.tasks = None
+
+    def route(self, path: str, methods=None, cache: float = None, vary=(), timeout: float = None):
+        if methods is None:
+            methods = ['GET']
 
-    command = sys.argv[1]
+        def decorator(func: Callable):
+            with self._routes_lock:
+                if _accepts_request(func):
+                    self.request_handlers.add(func)
+                for method in methods:
+                    self.routes[(method, path)] = func
+                    self.router.add(method, path, func)
+                    if cache and method == 'GET':
+                        self.cache_policies[(method, path)] = (cache, tuple(vary))
+                    else:
+                        self.cache_policies.pop((method, path), None)
+                    if timeout:
+                        self.route_timeouts[(method, path)] = timeout
+                    else:
+                        self.route_timeouts.pop((method, path), None)
+                self._openapi_document = None
+            return func
+        return decorator
 
-    if command == '--version' or command == '-v':
-        try:
-            import hej
-            print(f"hej {hej.__version__}")
-        except:
-            print("hej 0.1.0")
-        sys.exit(0)
+    def get(self, path: str, cache: float = None, vary=(), timeout: float = None):
+        return self.route(path, ['GET'], cache=cache, vary=vary, timeout=timeout)
 
-    elif command == 'convert':
-        if len(sys.argv) < 3:
-            print("Usage: hej convert <flask_file> [output_file]")
-            sys.exit(1)
+    def make_request(self, method, target, headers, stream):
+        return Request(method, target, headers, stream, self.max_body_size, self.max_memory_size, self.max_form_parts)
 
-        flask_file = sys.argv[2]
-        output_file = sys.argv[3] if len(sys.argv) > 3 else flask_file.replace('.py', '_hej.py')
+    def handler_kwargs(self, match, request):
+        if match.handler in self.request_handlers:
+            return dict(match.params, request=request)
+        return match.params
 
-        if not os.path.isfile(flask_file):
-            print(f"Error: File '{flask_file}' not found")
-            sys.exit(1)
+    def handler_deadline(self, match):
+        return self.route_timeouts.get((match.method, match.pattern), self.handler_timeout)
 
-        try:
-            with open(flask_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+    def call_with_deadline(self, timeout, func, *args):
+        outcome = {}
+        lock = threading.Lock()
 
-            converted_content = convert_flask_to_hej(content)
+        def run():
+            try:
+                outcome['value'] = func(*args)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                with lock:
+                    if outcome.setdefault('state', 'done') == 'abandoned':
+                        self.admission.reclaim()
+
+        thread = threading.Thread(target=run, name='hej-deadline', daemon=True)
+        thread.start()
+        thread.join(timeout)
+        with lock:
+            if outcome.setdefault('state', 'abandoned') == 'abandoned':
+                self.admission.abandon()
+                raise HandlerTimeout(f'Handler exceeded its {timeout}s deadline')
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['value']
+
+    def record_shed(self, reason):
+        self.admission.record_shed(reason)
+
+    def static(self, url_path: str = '/static', directory: str = 'static', max_age: int = 0):
+        from .static import StaticFiles
+        self.static_mounts.append((url_path.rstrip('/') + '/', StaticFiles(directory, max_age)))
+
+    def enable_metrics(self, path: str = '/metrics'):
+        if self.metrics is None:
+            self.metrics = Metrics()
+        self.metrics_path = path
+        return self.metrics
+
+    def enable_profiling(self, every: int = 100, routes=None, output_dir: str = None, path: str = '/_profile'):
+        from .profiling import Profiler
+        self.profiler = Profiler(every, routes, output_dir)
+        self.profile_path = path
+        return self.profiler
+
+    def enable_tasks(self, workers: int = 4, max_queue: int = 1000, policy: str = 'reject', processes: bool = False):
+        from .tasks import BackgroundTasks
+        if self.tasks is None:
+            self.tasks = BackgroundTasks(workers, max_queue, policy, processes)
+        else:
+            self.tasks.configure(workers, max_queue, policy, processes)
+        return self.tasks
+
+    def task_pool(self):
+        if self.tasks is None:
+            self.enable_tasks()
+        return self.tasks
+
+    def background(self, func: Callable, *args, **kwargs):
+        return self.task_pool().submit(func, *args, **kwargs)
+
+    def every(self, seconds: float):
+        def decorator(func: Callable):
+            return self.task_pool().every(seconds, func)
+        return decorator
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(converted_content)
+    def run_after_response(self, request):
+        from .tasks import TaskQueueFull
+        for func, args, kwargs in request.tasks:
+            try:
+                self.background(func, *args, **kwargs)
+            except TaskQueueFull:
+                self.tasks.log_dropped(func)
+
+    def start_worker(self, slot=0):
+        if self.metrics is not None:
+            self.metrics.pid = os.getpid()
+        self.start_tasks(slot)
+
+    def start_tasks(self, slot=0):
+        if self.tasks is not None and slot == 0:
+            self.tasks.start()
+
+    def stop_tasks(self, timeout=None):
+        return self.tasks is None or self.tasks.shutdown(timeout)
+
+    def disable_profiling(self):
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
+    def admin_response(self, method, path, query):
+        if method not in ('GET', 'HEAD'):
+            return None
+        if self.swagger_enabled and ('GET', path) not in self.routes:
+            if path == self.openapi_path:
+                return self.openapi_document()
+            if path == self.swagger_path:
+                if self._swagger_page is None:
+                    self._swagger_page = CachedResponse(self.serve_swagger_ui().encode(), 0)
+                return self._swagger_page
+        if path.startswith(STYLESHEET_PREFIX):
+            return stylesheets.find(path)
+        if path == self.metrics_path and self.metrics is not None:
+            return CachedResponse(self.metrics.render(self.admission, self.tasks).encode(), 0, METRICS_CONTENT_TYPE)
+        if path == self.profile_path and self.profiler is not None:
+            params = dict(urllib.parse.parse_qsl(query))
+            top = int(params['top']) if params.get('top', '').isdigit() else None
+            body = self.profiler.summary(params.get('route'), params.get('sort', 'cumulative'), top)
+            return CachedResponse(body.encode(), 0, 'text/plain; charset=utf-8')
+        return None
+
+    def find_static(self, method, path):
+        if method in ('GET', 'HEAD'):
+            for prefix, files in self.static_mounts:
+                if path.startswith(prefix):
+                    return files, path[len(prefix):]
+        return None
+
+    def choose_encoding(self, length, content_type, accept_encoding):
+        if not self.compression_enabled or length < self.compress_min_size or not is_compressible(content_type):
+            return None, False
+        return negotiate(accept_encoding), True
+
+    def response_encoding(self, length, content_type, accept_encoding, headers=None):
+        headers = dict(headers or {})
+        if any(name.lower() == 'content-encoding' for name in headers):
+            return None, headers
+        encoding, vary = self.choose_encoding(length, content_type, accept_encoding)
+        if vary:
+            add_vary(headers)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return encoding, headers
+
+    def compress_body(self, body, content_type, accept_encoding, key=None, headers=None):
+        encoding, headers = self.response_encoding(len(body), content_type, accept_encoding, headers)
+        if encoding:
+            if key is None:
+                body = compress(body, encoding, self.compress_level)
+            else:
+                body = self.compression_cache.get(key, encoding, body, self.compress_level)
+        return body, headers
+
+    def cached_response(self, entry, request_headers):
+        encoding, vary = self.choose_encoding(len(entry.body), entry.content_type, request_headers.get('accept-encoding'))
+        etag = variant_etag(entry.etag, encoding) if encoding else entry.etag
+        headers = {'ETag': etag}
+        if entry.cache_control:
+            headers['Cache-Control'] = entry.cache_control
+        if vary:
+            headers['Vary'] = 'Accept-Encoding'
+        if etag_matches(etag, request_headers.get('if-none-match')):
+            return 304, b'', headers
+        body = entry.body
+        if encoding:
+            body = self.compression_cache.get(entry.etag, encoding, body, self.compress_level)
+            headers['Content-Encoding'] = encoding
+        return 200, body, headers
+
+    def resolve(self, method, path):
+        return self.router.resolve(method, path)
+
+    def cache_key(self, path, query, vary):
+        if not vary:
+            return path
+        params = urllib.parse.parse_qs(query)
+        return (path,) + tuple(tuple(params.get(name, ())) for name in vary)
 
-            print(f"Converted Flask app saved to: {output_file}")
+    def not_found(self, func: Callable):
+        self.not_found_handler = func
+        return func
 
-        except Exception as e:
-            print(f"Error converting file: {e}")
-            sys.exit(1)
-        sys.exit(0)
+    def render_template(self, template_name: str, context: dict = None):
+        return self.templates.render(template_name, context)
+
+    def render_result(self, result):
+        if isinstance(result, tuple) and len(result) == 2:
+            result = self.render_template(*result)
+        elif isinstance(result, str) and result.endswith('.html'):
+            result = self.render_template(result)
+        return str(result)
+
+    def make_response(self, result):
+        if isinstance(result, Response):
+            return result
+        if isinstance(result, (dict, list)):
+            return JSONResponse(result, encoder=self.json_encoder)
+        if isinstance(result, (bytes, bytearray, memoryview)):
+            return Response(result)
+        return StreamingResponse(self.render_chunks(result))
+
+    def cacheable_body(self, response):
+        if response.status != 200 or response.headers or isinstance(response, FileResponse):
+            return None
+        if isinstance(response, StreamingResponse):
+            return b''.join(response.buffered)
+        return bytes(response.body)
+
+    def render_chunks(self, result):
+        if isinstance(result, HTMLElement):
+            yield from result.stream()
+        elif isinstance(result, bytes):
+            yield result
+        elif not hasattr(result, '__next__'):
+            yield self.render_result(result).encode()
+        else:
+            for item in result:
+                if isinstance(item, HTMLElement):
+                    yield from item.stream()
+                elif isinstance(item, bytes):
+                    yield item
+                else:
+                    yield str(item).encode()
 
-    elif command == 'dev':
-        app_file = find_hej_app_files()
-        if not app_file:
-            print("Error: Could not find a Hej application file.")
-            print("Make sure you have a Python file that imports 'hej' and calls run()")
-            sys.exit(1)
+    def generate_openapi_spec(self):
+        import inspect
+        paths = {}
+        operation_ids = set()
+        with self._routes_lock:
+            routes = list(self.routes.items())
+        for (method, path), handler in routes:
+            path, parameters = openapi_path(path)
+            operation = {
+                'operationId': _operation_id(handler, method, operation_ids),
+                'responses': {'200': {'description': 'Successful response'}}
+            }
+            content = _response_content(_return_annotation(handler))
+            if content:
+                operation['responses']['200']['content'] = content
+            if handler in self.request_handlers and method in ('POST', 'PUT', 'PATCH'):
+                operation['requestBody'] = _request_body()
+            doc = inspect.getdoc(handler)
+            if doc:
+                summary, _, description = doc.partition('\n')
+                operation['summary'] = summary.strip()
+                if description.strip():
+                    operation['description'] = description.strip()
+            tag = path.strip('/').split('/')[0]
+            if tag and not tag.startswith('{'):
+                operation['tags'] = [tag]
+            if parameters:
+                operation['parameters'] = parameters
+                operation['responses']['404'] = {'description': 'No resource matches the path parameters'}
+            if inspect.iscoroutinefunction(handler):
+                operation['x-async'] = True
+            paths.setdefault(path, {})[method.lower()] = operation
 
-        print(f"Found Hej application: {app_file}")
-        filename = app_file
+        return {
+            'openapi': '3.0.0',
+            'info': dict(self.openapi_info),
+            'paths': paths
+        }
 
-    else:
-        filename = command
-        if not os.path.isfile(filename):
-            print(f"Error: File '{filename}' not found")
-            sys.exit(1)
+    def openapi_document(self):
+        document = self._openapi_document
+        if document is None:
+            with self._routes_lock:
+                document = self._openapi_document
+                if document is None:
+                    body = json.dumps(self.generate_openapi_spec()).encode()
+                    document = self._openapi_document = CachedResponse(body, 0, 'application/json')
+        return document
 
-    runpy.run_path(filename, run_name='__main__')
+    def serve_swagger_ui(self):
+        return SWAGGER_UI.format(spec_url=self.openapi_path)
+
+    def run(self, host='0.0.0.0', port=5000, debug=False, threads=8, request_queue_size=128, workers=1, reuse_port=False,
+            engine='threads'):
+        if not self.static_mounts and os.path.isdir('static'):
+            self.static()
+
+        if debug_flag(debug, 'profile', False) and self.profiler is None:
+            every = debug['profile']
+            self.enable_profiling(100 if every is True else every, debug.get('profile_routes'), debug.get('profile_dir'))
+
+        if engine not in ('threads', 'asyncio'):
+            raise ValueError(f"Unknown engine '{engine}', expected 'threads' or 'asyncio'")
+
+        from .handler import Handler
+        from .server import ThreadPoolServer, inherited_socket, reexec, serve_prefork
+
+        self.admission.max_in_flight = self.max_in_flight
+        self.admission.max_queue_wait = self.max_queue_wait
+        handler = type('Handler', (Handler,), {'app': self, 'debug': debug, 'timeout': self.keep_alive_timeout})
+
+        def make_server(sock=None):
+            if engine == 'asyncio':
+                from .aio import AsyncServer
+                return AsyncServer((host, port), self, debug=debug, threads=threads, request_queue_size=request_queue_size,
+                                   reuse_port=reuse_port, sock=sock)
+            return ThreadPoolServer((host, port), handler, threads=threads, request_queue_size=request_queue_size,
+                                    reuse_port=reuse_port, sock=sock, max_queue_wait=self.max_queue_wait,
+                                    retry_after=self.retry_after, on_shed=self.record_shed,
+                                    header_timeout=self.header_timeout)
+
+        if workers > 1:
+            if not hasattr(os, 'fork'):
+                print('Multiple workers require os.fork, falling back to a single process.')
+            else:
+                print(f'Server running on http://{host}:{port} with {workers} workers')
+                serve_prefork(make_server, workers, reuse_port=reuse_port, drain_timeout=self.graceful_timeout,
+                              sock=inherited_socket(port), on_worker_start=self.start_worker,
+                              on_worker_stop=lambda: self.stop_tasks(self.graceful_timeout))
+                print('Server stopped')
+                return
 
+        try:
+            self.server = make_server(inherited_socket(port))
+        except OSError as e:
+            if e.errno == errno.EADDRINUSE:
+                print(f'Port {port} is already in use. Try a different port or kill existing processes.')
+            else:
+                print(f'Error starting server: {e}')
+            return
+        print(f'Server running on http://{host}:{port}')
 
-if __name__ == '__main__':
-    main()
+        server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        server_thread.start()
+        self.start_tasks()
+
+        reason = self.wait_for_stop(server_thread)
+        if reason is None:
+            return
+        self.shutdown(server_thread)
+        if reason in ('reload', 'restart'):
+            print('Files changed, restarting...' if reason == 'reload' else 'Restarting...')
+            reexec(self.server.socket)
+        self.server.server_close()
+        print('Server stopped')
+
+    def wait_for_stop(self, server_thread):
+        import signal
+        restart_signal = getattr(signal, 'SIGHUP', None)
+        stopped = threading.Event()
+        reasons = []
+
+        def stop(reason, frame=None):
+            reasons.append('restart' if reason == restart_signal else reason)
+            stopped.set()
+
+        def watch():
+            from .reloader import wait_for_changes
+            wait_for_changes()
+            stop('reload')
+
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM, restart_signal):
+                if sig is not None:
+                    previous[sig] = signal.signal(sig, stop)
+        if self.reload_enabled:
+            threading.Thread(target=watch, daemon=True).start()
+        try:
+            while server_thread.is_alive() and not stopped.wait(1):
+                pass
+        except KeyboardInterrupt:
+            reasons.append('stop')
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        return reasons[0] if reasons else None
+
+    def shutdown(self, server_thread=None):
+        deadline = time.monotonic() + self.graceful_timeout
+        self.server.shutdown()
+        if server_thread is not None:
+            server_thread.join(self.graceful_timeout)
+        if not self.server.drain(max(0, deadline - time.monotonic())):
+            print(f'Requests still running after {self.graceful_timeout}s, stopping anyway')
+        if not self.stop_tasks(max(0, deadline - time.monotonic())):
+            print(f'Background tasks still running after {self.graceful_timeout}s, stopping anyway')
@@ -0,0 +1,73 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'content_type', 'expires', 'cache_control')
+
+    def __init__(self, body: bytes, ttl: float, content_type: str = 'text/html', cache_control: str = None):
+        self.body = body
+        self.etag = make_etag(body)
+        self.content_type = content_type
+        self.expires = time.monotonic() + ttl
+        self.cache_control = cache_control
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self._entries[key]
+                self.size -= len(entry.body)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, body: bytes, ttl: float, content_type: str = 'text/html') -> CachedResponse:
+        entry = CachedResponse(body, ttl, content_type)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,247 @@
+import glob
+import json
+import os
+import runpy
+import sys
+
+MANIFEST_PATH = os.path.join('__pycache__', 'hej-manifest.json')
+MANIFEST_VERSION = 1
+
+
+def source_versions():
+    versions = {}
+    for name in sorted(glob.glob('*.py')):
+        stat = os.stat(name)
+        versions[name] = [stat.st_mtime_ns, stat.st_size]
+    return versions
+
+
+def manifest_enabled():
+    return os.environ.get('HEJ_MANIFEST', '1') != '0'
+
+
+def load_manifest(versions):
+    if not manifest_enabled():
+        return None
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('files') != versions:
+        return None
+    return manifest
+
+
+def save_manifest(manifest):
+    if not manifest_enabled():
+        return
+    manifest = dict(manifest, version=MANIFEST_VERSION)
+    temporary = f'{MANIFEST_PATH}.{os.getpid()}'
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temporary, MANIFEST_PATH)
+    except OSError:
+        pass
+
+
+def find_hej_app_files():
+    versions = source_versions()
+    manifest = load_manifest(versions)
+    if manifest is not None:
+        return manifest['app_file']
+    app_file = detect_hej_app_file()
+    save_manifest({'files': versions, 'app_file': app_file})
+    return app_file
+
+
+def detect_hej_app_file():
+    candidates = [
+        'app.py', 'main.py', 'server.py', 'application.py',
+        'test.py', 'run.py', 'index.py', 'start.py'
+    ]
+
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            if has_hej_import_and_run(candidate):
+                return candidate
+
+    for py_file in glob.glob('*.py'):
+        if py_file not in ['__init__.py'] and has_hej_import_and_run(py_file):
+            return py_file
+
+    return None
+
+def has_hej_import_and_run(filename):
+    import ast
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        tree = ast.parse(content)
+
+        has_hej_import = False
+        has_run_call = False
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name == 'hej':
+                        has_hej_import = True
+            elif isinstance(node, ast.ImportFrom):
+                if node.module == 'hej':
+                    has_hej_import = True
+
+            if isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Attribute):
+                    if isinstance(node.func.value, ast.Name):
+                        if node.func.attr == 'run':
+                            has_run_call = True
+                elif isinstance(node.func, ast.Name) and node.func.id == 'run':
+                    has_run_call = True
+
+        return has_hej_import and has_run_call
+    except:
+        return False
+
+def convert_flask_to_hej(content):
+    import re
+
+    lines = content.split('\n')
+    converted_lines = []
+    app_name = None
+    has_run_call = False
+
+    for line in lines:
+        original_line = line
+
+        if 'from flask import' in line or 'import flask' in line:
+            line = 'import hej'
+
+        elif 'app = Flask(' in line:
+            match = re.search(r'app\s*=\s*Flask\([^)]*\)', line)
+            if match:
+                app_name = 'app'
+                continue
+
+        elif re.search(r'\w+\s*=\s*Flask\([^)]*\)', line):
+            match = re.search(r'(\w+)\s*=\s*Flask\([^)]*\)', line)
+            if match:
+                app_name = match.group(1)
+                continue
+
+        elif '@app.route(' in line:
+            match = re.search(r'@app\.route\(([^)]+)\)', line)
+            if match:
+                route_args = match.group(1)
+                methods_match = re.search(r'methods\s*=\s*\[([^\]]+)\]', route_args)
+                if methods_match:
+                    methods = methods_match.group(1).replace("'", "").replace('"', "").split(',')
+                    method = methods[0].strip().upper()
+                    route_path = re.sub(r',\s*methods\s*=\s*\[.*\]', '', route_args)
+                else:
+                    method = 'GET'
+                    route_path = route_args
+
+                if method == 'GET':
+                    line = f'@get({route_path})'
+                else:
+                    line = f'@app.route({route_path}, methods=["{method}"])'
+
+        elif re.search(r'if\s+__name__\s*==\s*[\'"]__main__[\'"]\s*:', line):
+            converted_lines.append(line)
+            converted_lines.append('    hej.run()')
+            has_run_call = True
+            continue
+
+        elif 'app.run(' in line:
+            if not has_run_call:
+                line = '    hej.run()'
+                has_run_call = True
+            else:
+                continue
+
+        converted_lines.append(line)
+
+    result = '\n'.join(converted_lines)
+
+    if app_name and app_name != 'app':
+        result = result.replace(f'@{app_name}.route(', '@get(')
+        result = result.replace(f'{app_name}.run(', 'hej.run(')
+
+    if not has_run_call:
+        result += '\n\nif __name__ == \'__main__\':\n    hej.run()'
+
+    return result
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: hej <command> [options]")
+        print("Commands:")
+        print("  <filename>    Run a specific Python file")
+        print("  dev           Auto-detect and run Hej application")
+        print("  convert       Convert Flask app to Hej format")
+        print("  --version     Show version information")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == '--version' or command == '-v':
+        try:
+            import hej
+            print(f"hej {hej.__version__}")
+        except:
+            print("hej 0.1.0")
+        sys.exit(0)
+
+    elif command == 'convert':
+        if len(sys.argv) < 3:
+            print("Usage: hej convert <flask_file> [output_file]")
+            sys.exit(1)
+
+        flask_file = sys.argv[2]
+        output_file = sys.argv[3] if len(sys.argv) > 3 else flask_file.replace('.py', '_hej.py')
+
+        if not os.path.isfile(flask_file):
+            print(f"Error: File '{flask_file}' not found")
+            sys.exit(1)
+
+        try:
+            with open(flask_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+            converted_content = convert_flask_to_hej(content)
+
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(converted_content)
+
+            print(f"Converted Flask app saved to: {output_file}")
+
+        except Exception as e:
+            print(f"Error converting file: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    elif command == 'dev':
+        app_file = find_hej_app_files()
+        if not app_file:
+            print("Error: Could not find a Hej application file.")
+            print("Make sure you have a Python file that imports 'hej' and calls run()")
+            sys.exit(1)
+
+        print(f"Found Hej application: {app_file}")
+        filename = app_file
+
+    else:
+        filename = command
+        if not os.path.isfile(filename):
+            print(f"Error: File '{filename}' not found")
+            sys.exit(1)
+
+    runpy.run_path(filename, run_name='__main__')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+WBITS = {'gzip': 31, 'deflate': 15}
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding: str):
+    if not accept_encoding:
+        return None
+    best, best_q = None, 0.0
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if name == '*':
+            name = 'gzip'
+        if name not in WBITS:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q or (q == best_q and name == 'gzip'):
+            best, best_q = name, q
+    return best
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def add_vary(headers: dict, value: str = 'Accept-Encoding'):
+    for name, current in headers.items():
+        if name.lower() == 'vary':
+            tokens = [token.strip().lower() for token in current.split(',')]
+            if value.lower() not in tokens and '*' not in tokens:
+                headers[name] = f'{current}, {value}' if current.strip() else value
+            return headers
+    headers['Vary'] = value
+    return headers
+
+
+def compress(body: bytes, encoding: str, level: int = 6) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks, encoding: str, level: int = 6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionCache:
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, encoding: str, body, level: int = 6) -> bytes:
+        cache_key = (key, encoding, level)
+        with self._lock:
+            data = self._entries.get(cache_key)
+            if data is not None:
+                self._entries.move_to_end(cache_key)
+                return data
+        data = compress(body() if callable(body) else body, encoding, level)
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                previous = self._entries.pop(cache_key, None)
+                if previous is not None:
+                    self.size -= len(previous)
+                self._entries[cache_key] = data
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,333 @@
+import http.server
+import inspect
+import itertools
+import socket
+import sys
+import time
+import traceback
+import urllib.parse
+from .compression import compress_stream
+from .metrics import debug_flag, errors_enabled
+from .overload import HandlerTimeout
+from .request import RequestError
+from .response import FileResponse, StreamingResponse
+from .static import StaticFiles, open_file
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    app = None
+    debug = False
+    route_label = None
+    response_status = None
+    response_bytes = 0
+    handler_time = 0.0
+    render_time = 0.0
+    request = None
+    writing = False
+
+    def setup(self):
+        super().setup()
+        self.requests_handled = 0
+
+    def handle_one_request(self):
+        if self.writing:
+            self.connection.settimeout(self.timeout)
+            self.writing = False
+        self.server.mark_idle(self.connection, True)
+        try:
+            waiting = self.rfile.peek(1)
+        except socket.timeout as e:
+            self.log_error('Request timed out: %r', e)
+            waiting = None
+        if not waiting:
+            self.close_connection = True
+            return
+        self.server.set_deadline(self.connection, self.server.header_timeout, replace=False)
+        super().handle_one_request()
+
+    def parse_request(self):
+        self.server.mark_idle(self.connection, False)
+        parsed = super().parse_request()
+        if not self.server.set_deadline(self.connection, None):
+            self.close_connection = True
+            return False
+        return parsed
+
+    def handle_request(self, method):
+        measure = self.app.metrics is not None or debug_flag(self.debug, 'log_timing', False)
+        if measure:
+            started = time.perf_counter()
+            self.handler_time = self.render_time = 0.0
+            self.route_label = None
+            self.response_status = None
+            self.response_bytes = 0
+        self.request = None
+        self.abandoned = False
+        try:
+            self.request = self.app.make_request(method, self.path, self.headers, self.rfile)
+            if self.app.admission.acquire():
+                try:
+                    self.dispatch(method)
+                finally:
+                    self.app.admission.release()
+            else:
+                self.send_unavailable(method)
+        except RequestError as e:
+            if self.request is None:
+                self.close_connection = True
+            self.send_body(e.status, str(e).encode(), method, 'text/plain; charset=utf-8')
+        finally:
+            if self.request is None or self.abandoned or not self.request.finish(self.app.drain_limit):
+                self.close_connection = True
+            if self.request is not None and self.request.tasks and not self.abandoned:
+                self.app.run_after_response(self.request)
+            if measure:
+                write_time = time.perf_counter() - started - self.handler_time - self.render_time
+                if self.app.metrics is not None:
+                    self.app.metrics.record(method, self.route_label, self.response_status, self.response_bytes,
+                                            self.handler_time, self.render_time, write_time)
+                if debug_flag(self.debug, 'log_timing', False):
+                    self.log_message('"%s" %s handler=%.2fms render=%.2fms write=%.2fms', self.requestline,
+                                     self.response_status, self.handler_time * 1000, self.render_time * 1000,
+                                     write_time * 1000)
+
+    def dispatch(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        admin = self.app.admin_response(method, url.path, url.query)
+        if admin is not None:
+            self.route_label = url.path
+            self.send_cached(admin, method)
+            return
+        static = self.app.find_static(method, url.path)
+        if static is not None:
+            self.route_label = url.path[:len(url.path) - len(static[1])] + '*'
+            self.send_static(*static, method)
+            return
+        match = self.app.resolve(method, url.path)
+        self.route_label = match.pattern
+        if match.handler is None:
+            if match.allowed:
+                self.send_body(405, b'Method Not Allowed', method, headers={'Allow': ', '.join(match.allowed)})
+            else:
+                self.send_body(404, self.not_found_body(), method)
+            return
+        policy = self.app.cache_policies.get((match.method, match.pattern))
+        if policy is not None:
+            key = self.app.cache_key(url.path, url.query, policy[1])
+            entry = self.app.response_cache.get(key)
+            if entry is None:
+                response = self.render_safely(match, method, complete=True)
+                if response is None:
+                    return
+                body = self.app.cacheable_body(response)
+                if body is None:
+                    self.write_response(response, method)
+                    return
+                entry = self.app.response_cache.set(key, body, policy[0], response.content_type)
+            self.send_cached(entry, method)
+            return
+        response = self.render_safely(match, method)
+        if response is not None:
+            self.write_response(response, method)
+
+    def render_safely(self, match, method, complete=False):
+        try:
+            return self.render(match, complete)
+        except RequestError:
+            raise
+        except HandlerTimeout as e:
+            self.app.record_shed('handler_timeout')
+            self.log_failure('"%s" %s', self.requestline, e)
+            self.abandoned = True
+            self.close_connection = True
+            self.send_body(504, b'Gateway Timeout', method)
+        except Exception:
+            self.log_exception(self.requestline)
+            self.send_body(500, b'Internal Server Error', method)
+        return None
+
+    def render(self, match, complete=False):
+        profiler = self.app.profiler
+        if profiler is not None and profiler.wants(match.pattern):
+            return profiler.run(match.pattern, self.render_timed, match, complete)
+        return self.render_timed(match, complete)
+
+    def render_timed(self, match, complete=False):
+        started = time.perf_counter()
+        timeout = self.app.handler_deadline(match)
+        if timeout:
+            result = self.app.call_with_deadline(timeout, self.call_handler, match.handler,
+                                                 self.app.handler_kwargs(match, self.request))
+        else:
+            result = self.call_handler(match.handler, self.app.handler_kwargs(match, self.request))
+        rendered = time.perf_counter()
+        self.handler_time = rendered - started
+        response = self.app.make_response(result)
+        response.prepare(float('inf') if complete else self.app.stream_threshold)
+        self.render_time = time.perf_counter() - rendered
+        return response
+
+    def call_handler(self, handler, params=None):
+        result = handler(**params) if params else handler()
+        if inspect.iscoroutine(result):
+            import asyncio
+            result = asyncio.run(result)
+        return result
+
+    def send_cached(self, entry, method):
+        status, body, headers = self.app.cached_response(entry, self.headers)
+        if status == 304:
+            self.send_head(304, headers=headers)
+        else:
+            self.send_body(status, body, method, entry.content_type, headers, compress=False)
+
+    def write_response(self, response, method):
+        if isinstance(response, FileResponse):
+            self.send_file(response, method)
+        elif isinstance(response, StreamingResponse) and not response.complete:
+            self.send_chunked(response.status, itertools.chain(response.buffered, response.chunks), method,
+                              response.content_type, response.headers)
+        elif isinstance(response, StreamingResponse):
+            self.send_body(response.status, b''.join(response.buffered), method, response.content_type, response.headers)
+        else:
+            self.send_body(response.status, response.body, method, response.content_type, response.headers)
+
+    def send_static(self, files, relpath, method):
+        f, static = files.open(relpath)
+        if f is None:
+            self.send_body(404, self.not_found_body(), method)
+            return
+        self.send_open_file(f, static, method)
+
+    def send_file(self, response, method):
+        f, static = open_file(response.path, response.cache_control, response.content_type)
+        if f is None:
+            self.send_body(404, self.not_found_body(), method)
+            return
+        self.send_open_file(f, static, method, response.headers)
+
+    def send_open_file(self, f, static, method, extra=None):
+        with f:
+            encoding, vary = None, False
+            if static.size <= self.app.max_compressed_static_size and not self.headers.get('Range'):
+                encoding, vary = self.app.choose_encoding(static.size, static.content_type, self.headers.get('Accept-Encoding'))
+            status, offset, length, headers = StaticFiles.prepare(static, self.headers, encoding, vary)
+            if extra:
+                headers.update(extra)
+            if status == 304:
+                self.send_head(304, headers=headers)
+                return
+            if encoding:
+                body = self.app.compression_cache.get(static.etag, encoding, f.read, self.app.compress_level)
+                self.send_body(status, body, method, static.content_type, headers, compress=False)
+                return
+            self.send_head(status, static.content_type, length, headers)
+            if method != 'HEAD' and length:
+                self.response_bytes = self.connection.sendfile(f, offset, length)
+
+    def not_found_body(self):
+        if self.app.not_found_handler:
+            try:
+                return str(self.call_handler(self.app.not_found_handler)).encode()
+            except Exception:
+                self.log_exception('not_found handler')
+        return b'Not Found'
+
+    def send_unavailable(self, method):
+        self.route_label = None
+        self.close_connection = True
+        self.send_body(503, b'Service Unavailable', method, 'text/plain; charset=utf-8',
+                       {'Retry-After': str(self.app.retry_after)})
+
+    def send_head(self, status, content_type='text/html', length=None, headers=None):
+        self.requests_handled += 1
+        self.response_status = status
+        if self.requests_handled >= self.app.max_keep_alive_requests or self.server.draining:
+            self.close_connection = True
+        bodyless = status == 304
+        chunked = length is None and not bodyless and self.request_version == 'HTTP/1.1'
+        if length is None and not chunked and not bodyless:
+            self.close_connection = True
+        if self.app.write_timeout and not self.writing:
+            self.connection.settimeout(self.app.write_timeout)
+            self.writing = True
+        self.send_response(status)
+        if not bodyless:
+            self.send_header('Content-Type', content_type)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        elif length is not None:
+            self.send_header('Content-Length', str(length))
+        if headers:
+            for name, value in headers.items():
+                self.send_header(name, value)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        elif self.request_version == 'HTTP/1.0':
+            self.send_header('Connection', 'keep-alive')
+        self.end_headers()
+        return chunked
+
+    def send_body(self, status, body, method, content_type='text/html', headers=None, compress=True):
+        if compress:
+            body, headers = self.app.compress_body(body, content_type, self.headers.get('Accept-Encoding'),
+                                                   headers=headers)
+        self.send_head(status, content_type, len(body), headers)
+        if method != 'HEAD':
+            self.wfile.write(body)
+            self.response_bytes = len(body)
+
+    def send_chunked(self, status, chunks, method, content_type='text/html', headers=None):
+        encoding, headers = self.app.response_encoding(self.app.stream_threshold, content_type,
+                                                       self.headers.get('Accept-Encoding'), headers)
+        if encoding:
+            chunks = compress_stream(chunks, encoding, self.app.compress_level)
+        chunked = self.send_head(status, content_type, headers=headers)
+        if method == 'HEAD':
+            return
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                self.response_bytes += len(chunk)
+                if chunked:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                else:
+                    self.wfile.write(chunk)
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            self.close_connection = True
+        except Exception:
+            self.close_connection = True
+            self.log_exception(self.requestline)
+
+    def log_request(self, code='-', size='-'):
+        if debug_flag(self.debug, 'log_requests'):
+            super().log_request(code, size)
+
+    def log_error(self, format, *args):
+        if debug_flag(self.debug, 'log_errors'):
+            super().log_error(format, *args)
+
+    def log_failure(self, format, *args):
+        if errors_enabled(self.debug):
+            sys.stderr.write('%s - - [%s] %s\n' % (self.address_string(), self.log_date_time_string(), format % args))
+
+    def log_exception(self, context):
+        if errors_enabled(self.debug):
+            self.log_failure('"%s" raised an exception', context)
+            traceback.print_exc()
+
+    def log_message(self, format, *args):
+        if debug_flag(self.debug, 'enabled'):
+            super().log_message(format, *args)
+
+    do_GET = lambda self: self.handle_request('GET')
+    do_POST = lambda self: self.handle_request('POST')
+    do_PUT = lambda self: self.handle_request('PUT')
+    do_DELETE = lambda self: self.handle_request('DELETE')
+    do_PATCH = lambda self: self.handle_request('PATCH')
+    do_HEAD = lambda self: self.handle_request('HEAD')
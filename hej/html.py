@@ -1,53 +1,205 @@
-import os
-import sys
-import json
-import time
-import glob
-import ast
-import runpy
-import http.server
-import socketserver
-import threading
-import urllib.parse
-from typing import Callable, Dict, Any
+import functools
+
+from .stylesheet import stylesheets
+
+TEXT_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+ATTR_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+ATTR_NAMES = {'class_': 'class', 'for_': 'for'}
+RAW_TEXT_TAGS = {'script', 'style'}
+
+
+class Markup(str):
+    def __html__(self):
+        return self
+
+
+def escape_text(text: str) -> str:
+    if '&' in text or '<' in text or '>' in text:
+        return text.translate(TEXT_ESCAPE)
+    return text
+
+
+def escape_attr(value: str) -> str:
+    if '&' in value or '<' in value or '>' in value or '"' in value:
+        return value.translate(ATTR_ESCAPE)
+    return value
+
+
+_open_tags = {}
+_close_tags = {}
+
+
+def _close_tag(tag):
+    close = _close_tags.get(tag)
+    if close is None:
+        close = _close_tags[tag] = Markup(f'</{tag}>')
+    return close
+
+
+def _render(root, chunk_size=None):
+    out = []
+    append = out.append
+    size = 0
+    stack = [root]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node = pop()
+        cls = type(node)
+        if cls is str:
+            text = node.translate(TEXT_ESCAPE) if '&' in node or '<' in node or '>' in node else node
+        elif cls is Markup:
+            text = node
+        elif cls is FrozenElement:
+            if chunk_size is not None and len(node.data) >= chunk_size // 4:
+                if out:
+                    yield ''.join(out)
+                    out.clear()
+                    size = 0
+                yield node.data
+                continue
+            text = node.html
+        elif isinstance(node, HTMLElement):
+            tag = node.tag
+            attrs = node.attrs
+            if attrs:
+                text = '<' + tag + ''.join([' ' + ATTR_NAMES.get(k, k) + '="' + escape_attr(str(v)) + '"'
+                                            for k, v in attrs.items()]) + '>'
+            else:
+                text = _open_tags.get(tag)
+                if text is None:
+                    text = _open_tags[tag] = f'<{tag}>'
+            children = node.children
+            if tag in RAW_TEXT_TAGS:
+                text += ''.join([str(child) for child in children]) + _close_tag(tag)
+            elif len(children) == 1 and type(children[0]) is str:
+                text += escape_text(children[0]) + _close_tag(tag)
+            elif children:
+                push(_close_tag(tag))
+                stack.extend(reversed(children))
+            else:
+                text += _close_tag(tag)
+        elif hasattr(node, '__html__'):
+            text = node.__html__()
+        else:
+            text = escape_text(str(node))
+        append(text)
+        if chunk_size is not None:
+            size += len(text)
+            if size >= chunk_size:
+                yield ''.join(out)
+                out.clear()
+                size = 0
+    if out or chunk_size is None:
+        yield ''.join(out)
+
 
 class HTMLElement:
+    __slots__ = ('tag', 'attrs', 'children')
+
     def __init__(self, tag: str, *children, **attrs):
         self.tag = tag
         self.attrs = attrs
         self.children = list(children)
 
     def __str__(self):
-        attr_map = {'class_': 'class', 'for_': 'for'}
-        attrs_str = ''.join(f' {attr_map.get(k, k)}="{v}"' for k, v in self.attrs.items())
-        content = ''.join(str(child) for child in self.children)
-        return f'<{self.tag}{attrs_str}>{content}</{self.tag}>'
+        return next(_render(self))
+
+    def __html__(self):
+        return str(self)
+
+    def stream(self, chunk_size=16384):
+        for chunk in _render(self, chunk_size):
+            yield chunk if type(chunk) is bytes else chunk.encode()
+
+    def freeze(self):
+        return FrozenElement(self)
 
     def __call__(self, *children, **attrs):
         self.children.extend(children)
         self.attrs.update(attrs)
         return self
 
-class ScriptBuilder:
+
+class FrozenElement(HTMLElement):
+    __slots__ = ('html', 'data')
+
+    def __init__(self, element: HTMLElement):
+        super().__init__(element.tag, *element.children, **element.attrs)
+        self.html = Markup(str(element))
+        self.data = self.html.encode()
+
+    def __str__(self):
+        return self.html
+
+    def stream(self, chunk_size=16384):
+        yield self.data
+
+    def freeze(self):
+        return self
+
+    def __call__(self, *children, **attrs):
+        raise TypeError(f"Frozen <{self.tag}> element cannot be modified")
+
+class _Blocks:
+    _parts = ()
+    _text = None
+
+    @classmethod
+    def _join(cls, *parts):
+        builder = cls()
+        builder._parts = tuple(part for part in parts if part)
+        return builder
+
+    def _leaves(self):
+        stack = [iter(self._parts)]
+        while stack:
+            for part in stack[-1]:
+                if isinstance(part, _Blocks):
+                    if part._text is not None:
+                        if part._text:
+                            yield part._text
+                    else:
+                        stack.append(iter(part._parts))
+                        break
+                else:
+                    yield part
+            else:
+                stack.pop()
+
+    @property
+    def blocks(self):
+        return list(self._leaves())
+
+    def __bool__(self):
+        return bool(self._parts)
+
+    def __str__(self):
+        if self._text is None:
+            self._text = '\n'.join(self._leaves())
+        return self._text
+
+    def __html__(self):
+        return str(self)
+
+class ScriptBuilder(_Blocks):
     def __init__(self, code=None):
-        self.blocks = [code] if code else []
+        if code:
+            self._parts = (str(code),)
 
     def _process_blocks(self, blocks):
         result = []
         for block in blocks:
-            if isinstance(block, ScriptBuilder):
-                result.extend(block.blocks)
-            elif callable(block):
-                result.extend(block().blocks if isinstance(block(), ScriptBuilder) else [str(block())])
-            else:
-                result.append(str(block))
+            if callable(block) and not isinstance(block, _Blocks):
+                block = block()
+            result.append(block if isinstance(block, ScriptBuilder) else str(block))
         return result
 
     def __call__(self, *blocks):
-        return ScriptBuilder('\n'.join(self.blocks + self._process_blocks(blocks)))
+        return ScriptBuilder._join(self, *self._process_blocks(blocks))
 
     def _add_event_handler(self, event_code, blocks):
-        return ScriptBuilder('\n'.join([event_code] + self._process_blocks(blocks) + ['});']))
+        return ScriptBuilder._join(event_code, *self._process_blocks(blocks), '});')
 
     def when_dom_ready(self, *blocks):
         return self._add_event_handler("document.addEventListener('DOMContentLoaded', function() {", blocks)
@@ -58,15 +210,13 @@ class ScriptBuilder:
     def alert(self, message):
         return ScriptBuilder(f"alert('{message}');")
 
-    def __str__(self):
-        return '\n'.join(self.blocks)
-
-class CSSBuilder:
+class CSSBuilder(_Blocks):
     def __init__(self, selector=None, rules=None):
-        self.blocks = []
         self._mixins = {}
         if selector and rules:
-            self.blocks.append(f"{selector} {{\n{self._format_rules(rules)}\n}}")
+            self._parts = (f"{selector} {{\n{self._format_rules(rules)}\n}}",)
+        elif rules and not selector:
+            self._parts = (self._format_rules(rules),)
 
     def _format_rules(self, rules):
         if isinstance(rules, dict):
@@ -77,8 +227,10 @@ class CSSBuilder:
         result = []
         for block in blocks:
             if isinstance(block, CSSBuilder):
-                for b in block.blocks:
-                    result.append(indent + b.replace('\n', '\n' + indent))
+                if indent:
+                    result.extend(indent + b.replace('\n', '\n' + indent) for b in block._leaves())
+                else:
+                    result.append(block)
             elif isinstance(block, dict):
                 result.append(indent + self._format_rules(block))
             else:
@@ -86,11 +238,11 @@ class CSSBuilder:
         return result
 
     def __call__(self, *blocks):
-        return CSSBuilder('\n'.join(self.blocks + [str(block) for block in blocks if not isinstance(block, (CSSBuilder, dict))] +
-                                   [self._format_rules(block) for block in blocks if isinstance(block, dict)] +
-                                   [b for block in blocks if isinstance(block, CSSBuilder) for b in block.blocks]))
+        return CSSBuilder._join(self, *self._process_blocks(blocks))
 
     def __getattr__(self, selector: str):
+        if selector.startswith('__'):
+            raise AttributeError(selector)
         def selector_method(rules=None, **kwargs):
             if rules is None:
                 rules = kwargs
@@ -99,7 +251,7 @@ class CSSBuilder:
         return selector_method
 
     def nest(self, selector, *blocks):
-        return CSSBuilder(f"{selector} {{\n" + '\n'.join(self._process_blocks(blocks, '    ')) + "\n}")
+        return CSSBuilder._join(f"{selector} {{\n" + '\n'.join(self._process_blocks(blocks, '    ')) + "\n}")
 
     def mixin(self, name, rules=None, **kwargs):
         self._mixins[name] = rules or kwargs
@@ -109,7 +261,7 @@ class CSSBuilder:
         return CSSBuilder(rules=self._mixins.get(name, {}))
 
     def media(self, query, *blocks):
-        return CSSBuilder(f"@media {query} {{\n" + '\n'.join(self._process_blocks(blocks, '    ')) + "\n}")
+        return CSSBuilder._join(f"@media {query} {{\n" + '\n'.join(self._process_blocks(blocks, '    ')) + "\n}")
 
     def keyframes(self, name, *frames):
         frames_str = []
@@ -117,53 +269,68 @@ class CSSBuilder:
             if isinstance(frame, dict) and len(frame) == 1:
                 key, rules = next(iter(frame.items()))
                 frames_str.extend([f"    {key} {{", f"        {self._format_rules(rules)}", "    }"])
-        return CSSBuilder(f"@keyframes {name} {{\n" + '\n'.join(frames_str) + "\n}")
+        return CSSBuilder._join(f"@keyframes {name} {{\n" + '\n'.join(frames_str) + "\n}")
 
     def variable(self, name, value):
         return CSSBuilder(rules={f'--{name}': value})
 
     def __add__(self, other):
         if isinstance(other, CSSBuilder):
-            return CSSBuilder('\n'.join(self.blocks + other.blocks))
+            return CSSBuilder._join(self, other)
         return self
 
-    def __str__(self):
-        return '\n'.join(self.blocks)
+def _collect(cls, children):
+    parts = []
+    for child in children:
+        if callable(child) and not isinstance(child, _Blocks):
+            child = child()
+            if not isinstance(child, cls):
+                continue
+        parts.append(child if isinstance(child, cls) else str(child))
+    return cls._join(*parts)
+
+def _script_builder(*children, **attrs):
+    return HTMLElement('script', _collect(ScriptBuilder, children), **attrs)
+
+def _collect_css(children):
+    return _collect(CSSBuilder, children)
+
+def _style_builder(*children, **attrs):
+    if not html.inline_styles and not attrs:
+        return html.stylesheet(*children)
+    return HTMLElement('style', _collect_css(children), **attrs)
 
 class HTMLBuilder:
+    inline_styles = True
+
+    def stylesheet(self, *children, **attrs):
+        sheet = stylesheets.compile(_collect_css(children))
+        return HTMLElement('link', rel='stylesheet', href=sheet.url, **attrs)
+
     def tailwind_css(self):
         return HTMLElement('link', rel='stylesheet', href='/static/css/tailwind.css')
 
+    def raw(self, text):
+        return Markup(text)
+
+    def frozen(self, func):
+        @functools.lru_cache(maxsize=128)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return func(*args, **kwargs).freeze()
+        return wrapper
+
     def __getattr__(self, tag: str):
+        if tag.startswith('__'):
+            raise AttributeError(tag)
         if tag == 'script':
-            def script_builder(*children, **attrs):
-                sb = ScriptBuilder()
-                for child in children:
-                    if isinstance(child, ScriptBuilder):
-                        sb.blocks.extend(child.blocks)
-                    elif callable(child):
-                        result = child()
-                        if isinstance(result, ScriptBuilder):
-                            sb.blocks.extend(result.blocks)
-                    else:
-                        sb.blocks.append(str(child))
-                return HTMLElement(tag, sb, **attrs)
-            return script_builder
+            factory = _script_builder
         elif tag == 'style':
-            def style_builder(*children, **attrs):
-                cb = CSSBuilder()
-                for child in children:
-                    if isinstance(child, CSSBuilder):
-                        cb.blocks.extend(child.blocks)
-                    elif callable(child):
-                        result = child()
-                        if isinstance(result, CSSBuilder):
-                            cb.blocks.extend(result.blocks)
-                    else:
-                        cb.blocks.append(str(child))
-                return HTMLElement(tag, cb, **attrs)
-            return style_builder
-        return lambda *children, **attrs: HTMLElement(tag, *children, **attrs)
+            factory = _style_builder
+        else:
+            factory = functools.partial(HTMLElement, tag)
+        setattr(self, tag, factory)
+        return factory
 
 html = HTMLBuilder()
 
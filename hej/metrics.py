@@ -0,0 +1,172 @@
+import bisect
+import threading
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('handler', 'render', 'write')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.counts = list(self.counts)
+        histogram.total = self.total
+        return histogram
+
+
+class RouteStats:
+    __slots__ = ('statuses', 'bytes', 'phases')
+
+    def __init__(self):
+        self.statuses = {}
+        self.bytes = 0
+        self.phases = [Histogram() for _ in PHASES]
+
+
+class Metrics:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self.pid = None
+
+    def _shard(self):
+        shard = getattr(self._local, 'stats', None)
+        if shard is None:
+            shard = self._local.stats = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, method, route, status, nbytes, handler_time, render_time, write_time):
+        shard = self._shard()
+        key = (method, route or '<unmatched>')
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = RouteStats()
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.bytes += nbytes
+        handler, render, write = stats.phases
+        handler.observe(handler_time)
+        render.observe(render_time)
+        write.observe(write_time)
+
+    def snapshot(self):
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            for key, stats in list(shard.items()):
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = RouteStats()
+                for status, count in list(stats.statuses.items()):
+                    total.statuses[status] = total.statuses.get(status, 0) + count
+                total.bytes += stats.bytes
+                for target, source in zip(total.phases, stats.phases):
+                    target.counts = [a + b for a, b in zip(target.counts, source.counts)]
+                    target.total += source.total
+        return merged
+
+    def render(self, admission=None, tasks=None):
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            '# HELP hej_requests_total Total HTTP requests by route and status.',
+            '# TYPE hej_requests_total counter',
+        ]
+        for (method, route), stats in snapshot:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'hej_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}')
+        lines += [
+            '# HELP hej_response_bytes_total Total response body bytes by route.',
+            '# TYPE hej_response_bytes_total counter',
+        ]
+        for (method, route), stats in snapshot:
+            lines.append(f'hej_response_bytes_total{{method="{method}",route="{_label(route)}"}} {stats.bytes}')
+        lines += [
+            '# HELP hej_request_phase_seconds Time spent per request phase.',
+            '# TYPE hej_request_phase_seconds histogram',
+        ]
+        for (method, route), stats in snapshot:
+            for phase, histogram in zip(PHASES, stats.phases):
+                labels = f'method="{method}",route="{_label(route)}",phase="{phase}"'
+                lines += _histogram_lines('hej_request_phase_seconds', labels, histogram)
+        if admission is not None:
+            lines += [
+                '# HELP hej_in_flight_requests Requests currently admitted to a handler.',
+                '# TYPE hej_in_flight_requests gauge',
+                f'hej_in_flight_requests {admission.in_flight}',
+                '# HELP hej_abandoned_handlers Handlers still running after their deadline expired.',
+                '# TYPE hej_abandoned_handlers gauge',
+                f'hej_abandoned_handlers {admission.abandoned}',
+                '# HELP hej_shed_requests_total Requests rejected by overload protection.',
+                '# TYPE hej_shed_requests_total counter',
+            ]
+            for reason, count in sorted(admission.shed.items()):
+                lines.append(f'hej_shed_requests_total{{reason="{reason}"}} {count}')
+        if tasks is not None:
+            snapshot = tasks.snapshot()
+            lines += [
+                '# HELP hej_task_queue_depth Background tasks queued or running.',
+                '# TYPE hej_task_queue_depth gauge',
+                f'hej_task_queue_depth {snapshot["pending"]}',
+                '# HELP hej_tasks_total Background tasks by outcome.',
+                '# TYPE hej_tasks_total counter',
+            ]
+            for outcome, count in sorted(snapshot['outcomes'].items()):
+                lines.append(f'hej_tasks_total{{outcome="{outcome}"}} {count}')
+            lines += [
+                '# HELP hej_task_duration_seconds Background task run time.',
+                '# TYPE hej_task_duration_seconds histogram',
+            ]
+            for name, histogram in sorted(snapshot['durations'].items()):
+                lines += _histogram_lines('hej_task_duration_seconds', f'task="{_label(name)}"', histogram)
+        if self.pid is not None:
+            lines = [_add_label(line, f'pid="{self.pid}"') for line in lines]
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.total}')
+    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+    return lines
+
+
+def _add_label(line, label):
+    if line.startswith('#'):
+        return line
+    name, sep, rest = line.partition('{')
+    if sep:
+        return f'{name}{{{label},{rest}'
+    name, _, value = line.partition(' ')
+    return f'{name}{{{label}}} {value}'
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def errors_enabled(debug):
+    return not isinstance(debug, dict) or bool(debug.get('log_errors', True))
+
+
+def debug_flag(debug, name, default=True):
+    if isinstance(debug, dict):
+        return bool(debug.get('enabled', True)) and bool(debug.get(name, default))
+    return bool(debug) and default
@@ -0,0 +1,60 @@
+import threading
+import time
+
+SHED_BODY = b'Service Unavailable\n'
+
+
+class HandlerTimeout(Exception):
+    pass
+
+
+def shed_response(retry_after=1):
+    return (b'HTTP/1.1 503 Service Unavailable\r\n'
+            b'Content-Type: text/plain; charset=utf-8\r\n'
+            b'Content-Length: %d\r\n'
+            b'Retry-After: %d\r\n'
+            b'Connection: close\r\n\r\n%s' % (len(SHED_BODY), retry_after, SHED_BODY))
+
+
+class Admission:
+    def __init__(self, max_in_flight=None, max_queue_wait=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.in_flight = 0
+        self.abandoned = 0
+        self.shed = {}
+        self._state = threading.Condition()
+
+    def acquire(self, queued_at=None):
+        with self._state:
+            if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                deadline = (queued_at or time.monotonic()) + (self.max_queue_wait or 0)
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed['in_flight'] = self.shed.get('in_flight', 0) + 1
+                        return False
+                    self._state.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def admit(self):
+        with self._state:
+            self.in_flight += 1
+
+    def release(self):
+        with self._state:
+            self.in_flight -= 1
+            self._state.notify()
+
+    def abandon(self):
+        with self._state:
+            self.abandoned += 1
+
+    def reclaim(self):
+        with self._state:
+            self.abandoned -= 1
+
+    def record_shed(self, reason):
+        with self._state:
+            self.shed[reason] = self.shed.get(reason, 0) + 1
@@ -0,0 +1,86 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import threading
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls', 'time', 'name', 'filename')
+
+
+class Profiler:
+    def __init__(self, every=100, routes=None, output_dir=None, top=25):
+        self.every = max(1, int(every))
+        self.routes = set(routes) if routes else None
+        self.output_dir = output_dir
+        self.top = top
+        self._counter = itertools.count()
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._samples = {}
+
+    def wants(self, route):
+        if self.routes is not None and route not in self.routes:
+            return False
+        return next(self._counter) % self.every == 0
+
+    def run(self, route, func, *args):
+        if not self._active.acquire(blocking=False):
+            return func(*args)
+        try:
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(func, *args)
+            finally:
+                self._add(route, profile)
+        finally:
+            self._active.release()
+
+    def _add(self, route, profile):
+        with self._lock:
+            stats = self._stats.get(route)
+            if stats is None:
+                stats = self._stats[route] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._samples[route] = self._samples.get(route, 0) + 1
+            if self.output_dir:
+                os.makedirs(self.output_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.output_dir, _filename(route)))
+
+    def dump(self, directory=None):
+        directory = directory or self.output_dir or '.'
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        with self._lock:
+            for route, stats in self._stats.items():
+                path = os.path.join(directory, _filename(route))
+                stats.dump_stats(path)
+                paths.append(path)
+        return paths
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._samples.clear()
+
+    def summary(self, route=None, sort='cumulative', top=None):
+        if sort not in SORT_KEYS:
+            sort = 'cumulative'
+        out = io.StringIO()
+        with self._lock:
+            if not self._stats:
+                out.write(f'No requests profiled yet (sampling 1 in {self.every}).\n')
+            for name, stats in sorted(self._stats.items(), key=lambda item: str(item[0])):
+                if route is not None and name != route:
+                    continue
+                out.write(f'== {name} ({self._samples[name]} samples)\n')
+                stats.stream = out
+                stats.sort_stats(sort).print_stats(top or self.top)
+        return out.getvalue()
+
+
+def _filename(route):
+    return (re.sub(r'[^A-Za-z0-9_.-]+', '_', str(route)).strip('_') or 'root') + '.pstats'
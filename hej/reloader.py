@@ -0,0 +1,127 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import sysconfig
+import time
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def project_files(root=None):
+    root = os.path.abspath(root or os.getcwd())
+    excluded = {os.path.abspath(path) for name, path in sysconfig.get_paths().items()
+                if name in ('stdlib', 'platstdlib', 'purelib', 'platlib')}
+    files = set()
+    if os.path.isfile(sys.argv[0]):
+        files.add(os.path.abspath(sys.argv[0]))
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if not filename:
+            continue
+        filename = os.path.abspath(filename)
+        if filename.endswith('.pyc'):
+            filename = filename[:-1]
+        if not filename.startswith(root + os.sep) or any(filename.startswith(path + os.sep) for path in excluded):
+            continue
+        files.add(filename)
+    return files
+
+
+class PollingWatcher:
+    def __init__(self):
+        self._mtimes = {}
+
+    def poll(self, paths, timeout):
+        time.sleep(timeout)
+        changed = set()
+        for path in paths:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            previous = self._mtimes.get(path, mtime)
+            if previous != mtime:
+                changed.add(path)
+            self._mtimes[path] = mtime
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._directories = {}
+
+    def _watch(self, paths):
+        for directory in {os.path.dirname(path) for path in paths}:
+            if directory in self._directories.values():
+                continue
+            wd = self._add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                self._directories[wd] = directory
+
+    def poll(self, paths, timeout):
+        self._watch(paths)
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            directory = self._directories.get(wd)
+            if directory is not None and name:
+                path = os.path.join(directory, os.fsdecode(name))
+                if path in paths:
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher():
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+
+def wait_for_changes(get_paths=project_files, interval=1.0, debounce=0.2):
+    watcher = create_watcher()
+    try:
+        while True:
+            changed = watcher.poll(get_paths(), interval)
+            if changed:
+                while True:
+                    more = watcher.poll(get_paths(), debounce)
+                    if not more:
+                        return changed
+                    changed |= more
+    finally:
+        watcher.close()
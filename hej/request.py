@@ -0,0 +1,317 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import urllib.parse
+
+CHUNK_SIZE = 64 * 1024
+MAX_PART_HEADER_SIZE = 16 * 1024
+OPTION = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+class RequestError(Exception):
+    status = 400
+
+
+class RequestTooLarge(RequestError):
+    status = 413
+
+
+def parse_options(value):
+    main, _, rest = (value or '').partition(';')
+    options = {}
+    for name, option in OPTION.findall(';' + rest):
+        option = option.strip()
+        if option.startswith('"') and option.endswith('"'):
+            option = re.sub(r'\\(.)', r'\1', option[1:-1])
+        options[name.lower()] = option
+    return main.strip().lower(), options
+
+
+class BodyReader:
+    def __init__(self, stream, length=0, chunked=False, max_size=None):
+        self.stream = stream
+        self.remaining = length
+        self.chunked = chunked
+        self.max_size = max_size
+        self.consumed = 0
+        self.done = not chunked and not length
+        self._chunk_left = 0
+
+    def _check(self, size):
+        self.consumed += size
+        if self.max_size is not None and self.consumed > self.max_size:
+            raise RequestTooLarge(f'Request body exceeds {self.max_size} bytes')
+
+    def _next_chunk(self):
+        line = self.stream.readline(1024)
+        if not line.endswith(b'\n'):
+            raise RequestError('Malformed chunked body')
+        try:
+            size = int(line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise RequestError('Malformed chunked body')
+        if size == 0:
+            while True:
+                trailer = self.stream.readline(1024)
+                if trailer in (b'\r\n', b'\n', b''):
+                    break
+            self.done = True
+        return size
+
+    def read(self, size=-1):
+        if self.done:
+            return b''
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(CHUNK_SIZE), b''))
+        if self.chunked:
+            if not self._chunk_left:
+                self._chunk_left = self._next_chunk()
+                if self.done:
+                    return b''
+            data = self.stream.read(min(size, self._chunk_left))
+            if not data:
+                raise RequestError('Incomplete request body')
+            self._chunk_left -= len(data)
+            if not self._chunk_left:
+                self.stream.readline(1024)
+        else:
+            data = self.stream.read(min(size, self.remaining))
+            if not data:
+                raise RequestError('Incomplete request body')
+            self.remaining -= len(data)
+            self.done = not self.remaining
+        self._check(len(data))
+        return data
+
+    def __iter__(self):
+        return iter(lambda: self.read(CHUNK_SIZE), b'')
+
+    def drain(self, limit):
+        drained = 0
+        while not self.done:
+            if drained > limit:
+                return False
+            drained += len(self.read(CHUNK_SIZE))
+        return True
+
+
+class UploadFile:
+    def __init__(self, name, filename, content_type, headers, file, size):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.headers = headers
+        self.file = file
+        self.size = size
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def save(self, path):
+        self.file.seek(0)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(self.file, f, CHUNK_SIZE)
+        self.file.seek(0)
+
+    def close(self):
+        self.file.close()
+
+    def __repr__(self):
+        return f'<UploadFile {self.name!r} filename={self.filename!r} size={self.size}>'
+
+
+def _part_headers(block):
+    headers = {}
+    for line in block.decode('utf-8', 'replace').split('\r\n'):
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def parse_multipart(reader, boundary, max_memory_size, max_parts=1000):
+    delimiter = b'\r\n--' + boundary.encode('latin-1')
+    keep = len(delimiter) + 4
+    buffer = b'\r\n'
+    fields = {}
+    files = {}
+    eof = False
+
+    def fill(minimum):
+        nonlocal buffer, eof
+        while len(buffer) < minimum and not eof:
+            data = reader.read(CHUNK_SIZE)
+            if not data:
+                eof = True
+            buffer += data
+
+    while True:
+        index = buffer.find(delimiter)
+        if index >= 0:
+            buffer = buffer[index + len(delimiter):]
+            break
+        if eof:
+            raise RequestError('Multipart boundary not found')
+        buffer = buffer[-keep:]
+        fill(len(buffer) + 1)
+
+    parts = 0
+    while True:
+        fill(2)
+        if buffer.startswith(b'--'):
+            break
+        end = buffer.find(b'\r\n\r\n')
+        while end < 0:
+            if eof or len(buffer) > MAX_PART_HEADER_SIZE:
+                raise RequestError('Malformed multipart part headers')
+            fill(len(buffer) + 1)
+            end = buffer.find(b'\r\n\r\n')
+        if end > MAX_PART_HEADER_SIZE:
+            raise RequestError('Malformed multipart part headers')
+        headers = _part_headers(buffer[:end].lstrip(b' \t\r\n'))
+        buffer = buffer[end + 4:]
+        parts += 1
+        if parts > max_parts:
+            raise RequestTooLarge(f'More than {max_parts} multipart parts')
+        _, options = parse_options(headers.get('content-disposition'))
+        name = options.get('name', '')
+        filename = options.get('filename')
+        if filename is not None:
+            sink = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+        else:
+            sink = bytearray()
+        size = 0
+        while True:
+            index = buffer.find(delimiter)
+            if index >= 0:
+                data, buffer = buffer[:index], buffer[index + len(delimiter):]
+            elif eof:
+                raise RequestError('Unterminated multipart body')
+            else:
+                data, buffer = buffer[:-keep], buffer[-keep:]
+            size += len(data)
+            if filename is None and size > max_memory_size:
+                raise RequestTooLarge(f'Form field {name!r} exceeds {max_memory_size} bytes')
+            if data:
+                if filename is None:
+                    sink += data
+                else:
+                    sink.write(data)
+            if index >= 0:
+                break
+            fill(len(buffer) + CHUNK_SIZE)
+        if filename is None:
+            fields[name] = sink.decode(options.get('charset', 'utf-8'), 'replace')
+        else:
+            sink.seek(0)
+            previous = files.get(name)
+            if previous is not None:
+                previous.close()
+            files[name] = UploadFile(name, os.path.basename(filename.replace('\\', '/')),
+                                     headers.get('content-type', 'application/octet-stream'), headers, sink, size)
+    reader.drain(float('inf'))
+    return fields, files
+
+
+class Request:
+    def __init__(self, method, target, headers, stream=None, max_body_size=None, max_memory_size=1024 * 1024,
+                 max_form_parts=1000):
+        self.method = method
+        self.target = target
+        url = urllib.parse.urlsplit(target)
+        self.path = url.path
+        self.query_string = url.query
+        self.headers = {name.lower(): value for name, value in headers.items()}
+        self.max_body_size = max_body_size
+        self.max_memory_size = max_memory_size
+        self.max_form_parts = max_form_parts
+        self.content_type, self.content_options = parse_options(self.headers.get('content-type'))
+        encoding = self.headers.get('transfer-encoding', '').lower()
+        if encoding and encoding != 'chunked':
+            raise RequestError(f'Unsupported transfer encoding {encoding!r}')
+        try:
+            self.content_length = None if encoding else int(self.headers.get('content-length') or 0)
+        except ValueError:
+            raise RequestError('Invalid Content-Length')
+        if self.content_length is not None and self.content_length < 0:
+            raise RequestError('Invalid Content-Length')
+        if max_body_size is not None and (self.content_length or 0) > max_body_size:
+            raise RequestTooLarge(f'Request body exceeds {max_body_size} bytes')
+        self.stream = BodyReader(stream, self.content_length or 0, bool(encoding), max_body_size)
+        self._args = None
+        self._body = None
+        self._json = None
+        self._form = None
+        self._files = None
+        self.tasks = []
+
+    @property
+    def args(self):
+        if self._args is None:
+            self._args = dict(urllib.parse.parse_qsl(self.query_string, keep_blank_values=True))
+        return self._args
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    @property
+    def body(self):
+        if self._body is None:
+            if self.stream.consumed:
+                raise RequestError('Request body was already consumed as a stream')
+            self._body = self.stream.read()
+        return self._body
+
+    @property
+    def json(self):
+        if self._json is None:
+            body = self.body
+            if not body:
+                return None
+            try:
+                self._json = json.loads(body)
+            except ValueError as e:
+                raise RequestError(f'Invalid JSON body: {e}')
+        return self._json
+
+    @property
+    def form(self):
+        if self._form is None:
+            self._parse_form()
+        return self._form
+
+    @property
+    def files(self):
+        if self._files is None:
+            self._parse_form()
+        return self._files
+
+    def _parse_form(self):
+        if self.content_type == 'multipart/form-data':
+            boundary = self.content_options.get('boundary')
+            if not boundary:
+                raise RequestError('Missing multipart boundary')
+            self._form, self._files = parse_multipart(self.stream, boundary, self.max_memory_size, self.max_form_parts)
+        elif self.content_type == 'application/x-www-form-urlencoded':
+            charset = self.content_options.get('charset', 'utf-8')
+            self._form = dict(urllib.parse.parse_qsl(self.body.decode(charset, 'replace'), keep_blank_values=True))
+            self._files = {}
+        else:
+            self._form, self._files = {}, {}
+
+    def after_response(self, func, *args, **kwargs):
+        self.tasks.append((func, args, kwargs))
+
+    def finish(self, drain_limit):
+        try:
+            return self.stream.drain(drain_limit)
+        except (RequestError, OSError):
+            return False
+        finally:
+            for upload in (self._files or {}).values():
+                upload.close()
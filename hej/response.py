@@ -0,0 +1,69 @@
+import json
+import os
+import urllib.parse
+
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class Response:
+    content_type = 'text/html'
+
+    def __init__(self, body=b'', status: int = 200, headers: dict = None, content_type: str = None):
+        if isinstance(body, str):
+            body = body.encode()
+        elif isinstance(body, memoryview):
+            body = body.cast('B') if body.format != 'B' or body.ndim != 1 else body
+        self.body = body
+        self.status = status
+        self.headers = dict(headers) if headers else {}
+        if content_type is not None:
+            self.content_type = content_type
+
+    def prepare(self, threshold):
+        pass
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.status} {self.content_type}>'
+
+
+class JSONResponse(Response):
+    content_type = 'application/json'
+
+    def __init__(self, data, status: int = 200, headers: dict = None, encoder: json.JSONEncoder = None):
+        super().__init__((encoder or JSON_ENCODER).encode(data).encode(), status, headers)
+
+
+class StreamingResponse(Response):
+    def __init__(self, chunks, status: int = 200, headers: dict = None, content_type: str = None):
+        super().__init__(b'', status, headers, content_type)
+        self.chunks = iter(chunks)
+        self.buffered = []
+        self.complete = False
+
+    @staticmethod
+    def _encoded(chunks):
+        for chunk in chunks:
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+
+    def prepare(self, threshold):
+        self.chunks = self._encoded(self.chunks)
+        size = 0
+        for chunk in self.chunks:
+            self.buffered.append(chunk)
+            size += len(chunk)
+            if size >= threshold:
+                return
+        self.complete = True
+
+
+class FileResponse(Response):
+    content_type = None
+
+    def __init__(self, path, status: int = 200, headers: dict = None, content_type: str = None, filename: str = None,
+                 cache_control: str = 'no-cache'):
+        super().__init__(b'', status, headers, content_type)
+        self.path = os.fspath(path)
+        self.cache_control = cache_control
+        if filename is not None:
+            quoted = urllib.parse.quote(filename)
+            self.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quoted}"
@@ -0,0 +1,165 @@
+import urllib.parse
+from collections import namedtuple
+
+
+def _to_int(value):
+    if not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+
+def _to_float(value):
+    if not value.replace('.', '', 1).lstrip('-').isdigit():
+        raise ValueError(value)
+    return float(value)
+
+
+def _to_uuid(value):
+    import uuid
+    return uuid.UUID(value)
+
+
+def _to_str(value):
+    if not value:
+        raise ValueError(value)
+    return value
+
+
+CONVERTERS = {
+    'int': (_to_int, {'type': 'integer'}),
+    'float': (_to_float, {'type': 'number'}),
+    'uuid': (_to_uuid, {'type': 'string', 'format': 'uuid'}),
+    'str': (_to_str, {'type': 'string'}),
+    'path': (_to_str, {'type': 'string'}),
+}
+PRIORITY = ['int', 'float', 'uuid', 'str']
+
+RouteMatch = namedtuple('RouteMatch', ['handler', 'method', 'pattern', 'params', 'allowed'])
+
+
+def parse_pattern(pattern: str):
+    segments = []
+    for segment in pattern.split('/')[1:]:
+        if segment.startswith('<') and segment.endswith('>'):
+            converter, _, name = segment[1:-1].rpartition(':')
+            converter = converter or 'str'
+            if converter not in CONVERTERS:
+                raise ValueError(f"Unknown converter '{converter}' in route '{pattern}'")
+            segments.append((converter, name))
+        else:
+            segments.append((None, segment))
+    for converter, _ in segments[:-1]:
+        if converter == 'path':
+            raise ValueError(f"<path:...> must be the last segment in route '{pattern}'")
+    return segments
+
+
+def openapi_path(pattern: str):
+    parts = []
+    parameters = []
+    for converter, name in parse_pattern(pattern):
+        if converter is None:
+            parts.append(name)
+        else:
+            parts.append('{' + name + '}')
+            parameters.append({'name': name, 'in': 'path', 'required': True, 'schema': dict(CONVERTERS[converter][1])})
+    return '/' + '/'.join(parts), parameters
+
+
+class Node:
+    __slots__ = ('static', 'params', 'rest', 'handlers')
+
+    def __init__(self):
+        self.static = {}
+        self.params = {}
+        self.rest = None
+        self.handlers = {}
+
+
+class Router:
+    def __init__(self):
+        self.root = Node()
+        self.static_routes = {}
+
+    def add(self, method: str, pattern: str, handler):
+        node = self.root
+        names = []
+        for converter, value in parse_pattern(pattern):
+            if converter is None:
+                node = node.static.setdefault(value, Node())
+            elif converter == 'path':
+                if node.rest is None:
+                    node.rest = Node()
+                node = node.rest
+                names.append(value)
+            else:
+                node = node.params.setdefault(converter, Node())
+                names.append(value)
+        node.handlers[method] = (handler, names, pattern)
+        if not names:
+            self.static_routes[pattern] = node
+
+    @staticmethod
+    def _accepts(node, methods, allowed):
+        if not node.handlers:
+            return False
+        if methods is None or any(method in node.handlers for method in methods):
+            return True
+        if allowed is not None:
+            allowed.update(node.handlers)
+        return False
+
+    def match(self, path: str, methods=None, allowed=None):
+        node = self.static_routes.get(path)
+        if node is not None and self._accepts(node, methods, allowed):
+            return node, []
+        values = []
+        node = self._match(self.root, path.split('/')[1:], 0, values, methods, allowed)
+        if node is None:
+            return None
+        return node, values
+
+    def _match(self, node, segments, index, values, methods=None, allowed=None):
+        if index == len(segments):
+            return node if self._accepts(node, methods, allowed) else None
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            found = self._match(child, segments, index + 1, values, methods, allowed)
+            if found is not None:
+                return found
+        if node.params:
+            value = urllib.parse.unquote(segment)
+            for converter in PRIORITY:
+                child = node.params.get(converter)
+                if child is None:
+                    continue
+                try:
+                    values.append(CONVERTERS[converter][0](value))
+                except ValueError:
+                    continue
+                found = self._match(child, segments, index + 1, values, methods, allowed)
+                if found is not None:
+                    return found
+                values.pop()
+        if node.rest is not None:
+            rest = '/'.join(segments[index:])
+            if rest and self._accepts(node.rest, methods, allowed):
+                values.append(urllib.parse.unquote(rest))
+                return node.rest
+        return None
+
+    def resolve(self, method: str, path: str) -> RouteMatch:
+        allowed = set()
+        found = self.match(path, (method, 'GET') if method == 'HEAD' else (method,), allowed)
+        if found is None:
+            if 'GET' in allowed:
+                allowed.add('HEAD')
+            return RouteMatch(None, method, None, {}, tuple(sorted(allowed)))
+        node, values = found
+        entry = node.handlers.get(method)
+        if entry is None:
+            method = 'GET'
+            entry = node.handlers[method]
+        handler, names, pattern = entry
+        return RouteMatch(handler, method, pattern, dict(zip(names, values)), ())
@@ -0,0 +1,286 @@
+import os
+import queue
+import select
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from .overload import shed_response
+
+LISTEN_FD_ENV = 'HEJ_LISTEN_FD'
+
+
+class ThreadPoolServer(socketserver.TCPServer):
+    allow_reuse_address = True
+    reap_interval = 0.25
+
+    def __init__(self, server_address, handler_class, threads=8, request_queue_size=128, reuse_port=False, sock=None,
+                 bind_and_activate=True, max_queue_wait=None, retry_after=1, on_shed=None, header_timeout=None):
+        self.threads = max(1, int(threads))
+        self.request_queue_size = request_queue_size
+        self.reuse_port = reuse_port
+        self.max_queue_wait = max_queue_wait
+        self.retry_after = retry_after
+        self.on_shed = on_shed
+        self.header_timeout = header_timeout
+        self.draining = False
+        self._requests = queue.Queue(maxsize=self.threads)
+        self._workers = []
+        self._active = 0
+        self._idle_connections = {}
+        self._deadlines = {}
+        self._queued = set()
+        self._reaper = None
+        self._closed = threading.Event()
+        self._state = threading.Condition()
+        super().__init__(server_address, handler_class, bind_and_activate and sock is None)
+        if sock is not None:
+            self.socket.close()
+            self.socket = sock
+            self.server_address = sock.getsockname()
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def start_workers(self):
+        for i in range(self.threads - len(self._workers)):
+            worker = threading.Thread(target=self._work, name=f'hej-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        if self.header_timeout and self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name='hej-reaper', daemon=True)
+            self._reaper.start()
+
+    def serve_forever(self, poll_interval=0.5):
+        self.start_workers()
+        super().serve_forever(poll_interval)
+
+    def process_request(self, request, client_address):
+        with self._state:
+            self._active += 1
+            self._queued.add(request)
+            saturated = self._active > self.threads
+        if saturated:
+            self._close_idle(oldest=True)
+        self.set_deadline(request, self.header_timeout)
+        self._requests.put((request, client_address, time.monotonic()))
+
+    def mark_idle(self, connection, idle):
+        with self._state:
+            if idle:
+                self._idle_connections[connection] = True
+            else:
+                self._idle_connections.pop(connection, None)
+        if idle and self.draining:
+            self._close_idle()
+
+    def set_deadline(self, connection, timeout, replace=True):
+        with self._state:
+            if timeout:
+                if replace or connection not in self._deadlines:
+                    self._deadlines[connection] = time.monotonic() + timeout
+                return True
+            return self._deadlines.pop(connection, 0) is not None
+
+    def _reap(self):
+        while not self._closed.wait(self.reap_interval):
+            self._expire_deadlines()
+
+    def _expire_deadlines(self):
+        if not self._deadlines:
+            return
+        now = time.monotonic()
+        with self._state:
+            expired = [(connection, connection in self._queued) for connection, deadline in self._deadlines.items()
+                       if deadline is not None and deadline <= now]
+        for connection, queued in expired:
+            with self._state:
+                if queued and _headers_received(connection):
+                    self._deadlines.pop(connection, None)
+                    continue
+                if connection not in self._deadlines:
+                    continue
+                self._deadlines[connection] = None
+            self._shed(connection, 'header_timeout')
+
+    def _shed(self, connection, reason, response=None):
+        if self.on_shed is not None:
+            self.on_shed(reason)
+        try:
+            if response:
+                connection.setblocking(False)
+                connection.send(response)
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _close_idle(self, oldest=False):
+        with self._state:
+            idle = list(self._idle_connections)
+        for connection in idle:
+            try:
+                readable, _, _ = select.select([connection], [], [], 0)
+                if not readable:
+                    with self._state:
+                        if self._idle_connections.pop(connection, None) is None:
+                            continue
+                    connection.shutdown(socket.SHUT_RD)
+                    if oldest:
+                        return
+            except (OSError, ValueError):
+                pass
+
+    def drain(self, timeout=None):
+        self.draining = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._close_idle()
+        with self._state:
+            while self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._state.wait(0.1 if remaining is None else min(0.1, remaining))
+        return True
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            request, client_address, queued_at = item
+            with self._state:
+                self._queued.discard(request)
+            try:
+                if self.max_queue_wait is not None and time.monotonic() - queued_at > self.max_queue_wait:
+                    self._shed(request, 'queue_wait', shed_response(self.retry_after))
+                else:
+                    self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._state:
+                    self._active -= 1
+                    self._idle_connections.pop(request, None)
+                    self._deadlines.pop(request, None)
+                    self._state.notify_all()
+
+    def server_close(self):
+        self._closed.set()
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+
+def _headers_received(connection):
+    try:
+        readable, _, _ = select.select([connection], [], [], 0)
+        return bool(readable) and b'\r\n\r\n' in connection.recv(65536, socket.MSG_PEEK)
+    except (OSError, ValueError):
+        return False
+
+
+def serve_prefork(make_server, workers, reuse_port=False, drain_timeout=None, sock=None, on_worker_start=None,
+                  on_worker_stop=None):
+    listener = None if reuse_port else make_server(sock)
+    children = {}
+    stopping = False
+    restarting = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            code = 0
+            try:
+                server = listener if listener is not None else make_server()
+                signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+                if on_worker_start is not None:
+                    on_worker_start(slot)
+                server.serve_forever()
+                if not server.drain(drain_timeout):
+                    code = 1
+                if on_worker_stop is not None and not on_worker_stop():
+                    code = 1
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (time.monotonic(), slot)
+
+    def stop(signum, frame):
+        nonlocal stopping, restarting
+        stopping = True
+        restarting = restarting or signum == signal.SIGHUP
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)}
+    try:
+        for slot in range(workers):
+            spawn(slot)
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            child = children.pop(pid, None)
+            if stopping or child is None:
+                continue
+            print(f'Worker {pid} exited with status {status}, restarting...')
+            started, slot = child
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+                if stopping:
+                    continue
+            spawn(slot)
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+        if restarting:
+            print('Restarting...')
+            reexec(listener.socket if listener is not None else None)
+        if listener is not None:
+            listener.server_close()
+
+
+def inherited_socket(port=None):
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is None:
+        return None
+    sock = socket.socket(fileno=int(fd))
+    sock.set_inheritable(False)
+    if port is not None and sock.getsockname()[1] != port:
+        sock.close()
+        return None
+    return sock
+
+
+def child_arguments():
+    args = [sys.executable] + [f'-W{option}' for option in sys.warnoptions]
+    args += [f'-X{name}' if value is True else f'-X{name}={value}' for name, value in sys._xoptions.items()]
+    spec = getattr(sys.modules.get('__main__'), '__spec__', None)
+    if spec is not None:
+        name = spec.parent if spec.name == '__main__' or spec.name.endswith('.__main__') else spec.name
+        if name:
+            return args + ['-m', name] + sys.argv[1:]
+    return args + sys.argv
+
+
+def reexec(sock=None):
+    if sock is not None:
+        sock.set_inheritable(True)
+        os.environ[LISTEN_FD_ENV] = str(sock.fileno())
+    os.execv(sys.executable, child_arguments())
@@ -0,0 +1,161 @@
+import email.utils
+import mimetypes
+import os
+import re
+import stat
+import threading
+import urllib.parse
+from collections import OrderedDict
+from .cache import etag_matches
+from .compression import variant_etag
+
+FINGERPRINT = re.compile(r'[.-](?=[0-9a-fA-F]*[0-9])(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\.')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+BYTE_RANGE = re.compile(r'bytes\s*=\s*([0-9]*)\s*-\s*([0-9]*)')
+
+
+class StaticFile:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'last_modified', 'content_type', 'cache_control')
+
+    def __init__(self, path, info, cache_control):
+        self.path = path
+        self.size = info.st_size
+        self.mtime = int(info.st_mtime)
+        self.etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+        self.last_modified = email.utils.formatdate(info.st_mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'application/json'):
+            self.content_type += '; charset=utf-8'
+        self.cache_control = cache_control
+
+    def matches(self, info):
+        return info.st_size == self.size and f'"{info.st_mtime_ns:x}-{info.st_size:x}"' == self.etag
+
+
+class StaticFiles:
+    def __init__(self, directory: str, max_age: int = 0, cache_size: int = 1024):
+        self.directory = os.path.realpath(directory)
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_control(self, path):
+        if FINGERPRINT.search(os.path.basename(path)):
+            return IMMUTABLE
+        return f'public, max-age={self.max_age}' if self.max_age else 'no-cache'
+
+    def resolve(self, relpath: str):
+        parts = urllib.parse.unquote(relpath).split('/')
+        if any(part in ('..', '.') or '\x00' in part or '\\' in part for part in parts) or not all(parts):
+            return None
+        path = os.path.realpath(os.path.join(self.directory, *parts))
+        if not path.startswith(self.directory + os.sep):
+            return None
+        return path
+
+    def open(self, relpath: str):
+        with self._lock:
+            static = self._cache.get(relpath)
+        path = static.path if static is not None else self.resolve(relpath)
+        if path is None:
+            return None, None
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self._forget(relpath)
+            return None, None
+        info = os.fstat(f.fileno())
+        if not stat.S_ISREG(info.st_mode):
+            f.close()
+            return None, None
+        if static is None or not static.matches(info):
+            static = StaticFile(path, info, self.cache_control(path))
+            with self._lock:
+                self._cache[relpath] = static
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return f, static
+
+    def _forget(self, relpath):
+        with self._lock:
+            self._cache.pop(relpath, None)
+
+    @staticmethod
+    def prepare(static: StaticFile, headers, encoding=None, vary=False):
+        etag = variant_etag(static.etag, encoding) if encoding else static.etag
+        response_headers = {
+            'ETag': etag,
+            'Last-Modified': static.last_modified,
+            'Cache-Control': static.cache_control,
+            'Accept-Ranges': 'bytes',
+        }
+        if vary:
+            response_headers['Vary'] = 'Accept-Encoding'
+        if_none_match = headers.get('if-none-match')
+        if if_none_match:
+            if etag_matches(etag, if_none_match):
+                return 304, 0, 0, response_headers
+        else:
+            since = parse_http_date(headers.get('if-modified-since'))
+            if since is not None and static.mtime <= since:
+                return 304, 0, 0, response_headers
+        if encoding:
+            response_headers['Content-Encoding'] = encoding
+            return 200, 0, static.size, response_headers
+        byte_range = headers.get('range')
+        if_range = headers.get('if-range')
+        if byte_range and (not if_range or if_range in (static.etag, static.last_modified)):
+            span = parse_range(byte_range, static.size)
+            if span is None:
+                response_headers['Content-Range'] = f'bytes */{static.size}'
+                return 416, 0, 0, response_headers
+            if span is not False:
+                start, end = span
+                response_headers['Content-Range'] = f'bytes {start}-{end}/{static.size}'
+                return 206, start, end - start + 1, response_headers
+        return 200, 0, static.size, response_headers
+
+
+def open_file(path, cache_control='no-cache', content_type=None):
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None, None
+    info = os.fstat(f.fileno())
+    if not stat.S_ISREG(info.st_mode):
+        f.close()
+        return None, None
+    static = StaticFile(path, info, cache_control)
+    if content_type:
+        static.content_type = content_type
+    return f, static
+
+
+def parse_http_date(value):
+    if not value:
+        return None
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return int(parsed.timestamp())
+
+
+def parse_range(value: str, size: int):
+    match = BYTE_RANGE.fullmatch(value.strip())
+    if match is None or not any(match.groups()):
+        return False
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return False
+    if start >= size:
+        return None
+    return start, min(end, size - 1)
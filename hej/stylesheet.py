@@ -0,0 +1,268 @@
+import getpass
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .cache import CachedResponse
+
+URL_PREFIX = '/_hej/css/'
+COMMENT = re.compile(r'/\*.*?\*/', re.S)
+SPACE = re.compile(r'\s+')
+SELECTOR_PUNCTUATION = re.compile(r'\s*([,>~+])\s*')
+VALUE_PUNCTUATION = re.compile(r'\s*(,)\s*')
+DIGEST = re.compile(r'[0-9a-f]{16}')
+VENDOR = re.compile(r'^-[a-z]+-')
+FAMILY_ALIASES = {'top': 'inset', 'right': 'inset', 'bottom': 'inset', 'left': 'inset', 'align': 'place',
+                  'justify': 'place', 'row': 'gap', 'column': 'columns', 'line': 'font'}
+GAP_LONGHANDS = {'column-gap', 'grid-gap', 'grid-row-gap', 'grid-column-gap'}
+STRING = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')''')
+
+
+def _squash(text, punctuation):
+    parts = STRING.split(text)
+    for i in range(0, len(parts), 2):
+        parts[i] = punctuation.sub(r'\1', SPACE.sub(' ', parts[i]))
+    return ''.join(parts).strip()
+
+
+def _split_rules(text):
+    rules = []
+    depth = 0
+    start = 0
+    quote = None
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote and text[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append(text[start:i + 1].strip())
+                start = i + 1
+        elif char == ';' and depth == 0:
+            rules.append(text[start:i + 1].strip())
+            start = i + 1
+    tail = text[start:].strip()
+    if tail:
+        rules.append(tail)
+    return [rule for rule in rules if rule]
+
+
+def _split_declarations(body):
+    parts = []
+    depth = 0
+    start = 0
+    quote = None
+    for i, char in enumerate(body):
+        if quote:
+            if char == quote and body[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ';' and depth == 0:
+            parts.append(body[start:i])
+            start = i + 1
+    parts.append(body[start:])
+    return parts
+
+
+def _declarations(body):
+    declarations = OrderedDict()
+    for declaration in _split_declarations(body):
+        name, sep, value = declaration.partition(':')
+        name = name.strip()
+        if sep and name:
+            if not name.startswith('--'):
+                name = name.lower()
+            declarations.pop(name, None)
+            declarations[name] = _squash(value, VALUE_PUNCTUATION)
+    return declarations
+
+
+def parse(text):
+    rules = []
+    for rule in _split_rules(COMMENT.sub('', text)):
+        selector, brace, body = rule.partition('{')
+        body = body[:-1] if body.endswith('}') else body
+        if not brace:
+            rules.append((None, SPACE.sub(' ', rule).strip()))
+        elif selector.lstrip().startswith('@'):
+            prelude = SPACE.sub(' ', selector).strip()
+            if '{' in body:
+                rules.append((None, prelude + '{' + minify(body) + '}'))
+            else:
+                rules.append((None, prelude + '{' + _format(_declarations(body)) + '}'))
+        else:
+            rules.append((_squash(selector, SELECTOR_PUNCTUATION), _declarations(body)))
+    return rules
+
+
+def _families(names):
+    families = set()
+    for name in names:
+        if name.startswith('--'):
+            families.add(name)
+            continue
+        name = VENDOR.sub('', name)
+        family = name.split('-', 1)[0]
+        families.add(FAMILY_ALIASES.get(family, family))
+        if name in GAP_LONGHANDS:
+            families.add('gap')
+    return families
+
+
+def _conflicts(first, second):
+    if not first or not second:
+        return False
+    return bool(first & second) or 'all' in first or 'all' in second
+
+
+def _combine(first, second):
+    combined = OrderedDict(first)
+    for name, value in second.items():
+        combined.pop(name, None)
+        combined[name] = value
+    return combined
+
+
+def merge(rules):
+    merged = []
+    positions = {}
+    for selector, declarations in rules:
+        if selector is None:
+            merged.append((None, declarations))
+            continue
+        index = positions.get(selector)
+        if index is not None:
+            between = set()
+            for other, other_declarations in merged[index + 1:]:
+                if other is None:
+                    between = None
+                    break
+                between.update(_families(other_declarations))
+            if between is not None:
+                previous = merged[index][1]
+                if not _conflicts(between, _families(declarations)):
+                    merged[index] = (selector, _combine(previous, declarations))
+                    continue
+                if not _conflicts(between, _families(previous)):
+                    merged[index] = (None, None)
+                    declarations = _combine(previous, declarations)
+        positions[selector] = len(merged)
+        merged.append((selector, declarations))
+    return [(selector, declarations) for selector, declarations in merged if declarations is not None]
+
+
+def _format(declarations):
+    return ';'.join(f'{name}:{value}' for name, value in declarations.items())
+
+
+def minify(text):
+    out = []
+    for selector, declarations in merge(parse(str(text))):
+        if selector is None:
+            out.append(declarations)
+        elif declarations:
+            out.append(selector + '{' + _format(declarations) + '}')
+    return ''.join(out)
+
+
+class Stylesheet:
+    __slots__ = ('text', 'digest', 'url', 'response')
+
+    def __init__(self, text):
+        self.text = text
+        self.digest = hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+        self.url = f'{URL_PREFIX}{self.digest}.css'
+        self.response = CachedResponse(text.encode(), 0, 'text/css; charset=utf-8', 'public, max-age=31536000, immutable')
+
+
+def _default_directory():
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = str(os.getpid())
+    return os.path.join(tempfile.gettempdir(), f'hej-css-{user}')
+
+
+class StylesheetCompiler:
+    def __init__(self, max_size=512, directory=None):
+        self.max_size = max_size
+        self.directory = directory
+        self._by_source = OrderedDict()
+        self._by_digest = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, source):
+        source = str(source)
+        with self._lock:
+            sheet = self._by_source.get(source)
+            if sheet is not None:
+                self._by_source.move_to_end(source)
+                return sheet
+        sheet = self._remember(Stylesheet(minify(source)), source)
+        self._store(sheet)
+        return sheet
+
+    def _remember(self, sheet, source=None):
+        with self._lock:
+            sheet = self._by_digest.setdefault(sheet.digest, sheet)
+            self._by_digest.move_to_end(sheet.digest)
+            if source is not None:
+                self._by_source[source] = sheet
+            for entries in (self._by_source, self._by_digest):
+                while len(entries) > self.max_size:
+                    entries.popitem(last=False)
+        return sheet
+
+    def _path(self, digest):
+        if self.directory is None:
+            self.directory = _default_directory()
+        return os.path.join(self.directory, digest + '.css')
+
+    def _store(self, sheet):
+        path = self._path(sheet.digest)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd, temp = tempfile.mkstemp('.tmp', dir=self.directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(sheet.text)
+            os.replace(temp, path)
+        except OSError:
+            pass
+
+    def _load(self, digest):
+        try:
+            with open(self._path(digest), encoding='utf-8') as f:
+                sheet = Stylesheet(f.read())
+        except (OSError, ValueError):
+            return None
+        return self._remember(sheet) if sheet.digest == digest else None
+
+    def find(self, path):
+        if not path.startswith(URL_PREFIX) or not path.endswith('.css'):
+            return None
+        digest = path[len(URL_PREFIX):-4]
+        if not DIGEST.fullmatch(digest):
+            return None
+        with self._lock:
+            sheet = self._by_digest.get(digest)
+        if sheet is None:
+            sheet = self._load(digest)
+        return sheet.response if sheet is not None else None
+
+
+stylesheets = StylesheetCompiler()
@@ -0,0 +1,170 @@
+import sys
+import threading
+import time
+import traceback
+
+from .metrics import Histogram
+
+POLICIES = ('reject', 'drop', 'caller_runs')
+
+
+class TaskQueueFull(Exception):
+    pass
+
+
+def _timed_call(func, args, kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def _task_name(func):
+    return getattr(func, '__qualname__', None) or getattr(func, '__name__', None) or type(func).__name__
+
+
+class BackgroundTasks:
+    def __init__(self, workers=4, max_queue=1000, policy='reject', processes=False):
+        self._executor = None
+        self.configure(workers, max_queue, policy, processes)
+        self.pending = 0
+        self.outcomes = {}
+        self.durations = {}
+        self._periodic = []
+        self._scheduler = None
+        self._stop = threading.Event()
+        self._state = threading.Condition()
+
+    def configure(self, workers=4, max_queue=1000, policy='reject', processes=False):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {', '.join(POLICIES)}")
+        workers = max(1, int(workers))
+        if self._executor is not None and (workers, processes) != (self.workers, self.processes):
+            raise RuntimeError('Cannot resize the task pool after tasks have been submitted')
+        self.workers = workers
+        self.max_queue = max_queue
+        self.policy = policy
+        self.processes = processes
+
+    def _pool(self):
+        if self._executor is None:
+            with self._state:
+                if self._executor is None:
+                    if self.processes:
+                        from concurrent.futures import ProcessPoolExecutor
+                        self._executor = ProcessPoolExecutor(self.workers)
+                    else:
+                        from concurrent.futures import ThreadPoolExecutor
+                        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='hej-task')
+        return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        name = _task_name(func)
+        with self._state:
+            full = self.max_queue is not None and self.pending >= self.max_queue
+            if not full:
+                self.pending += 1
+        if full:
+            return self._overflow(name, func, args, kwargs)
+        try:
+            future = self._pool().submit(_timed_call, func, args, kwargs)
+        except BaseException:
+            self._finish(name, 'rejected')
+            raise
+        future.add_done_callback(lambda done: self._done(name, done))
+        return future
+
+    def _overflow(self, name, func, args, kwargs):
+        if self.policy == 'caller_runs':
+            with self._state:
+                self.pending += 1
+            try:
+                duration = _timed_call(func, args, kwargs)
+            except Exception:
+                self._finish(name, 'failed')
+                self._log_failure(name, sys.exc_info()[1])
+            else:
+                self._finish(name, 'completed', duration)
+            return None
+        self._finish(name, 'rejected' if self.policy == 'reject' else 'dropped', pending=False)
+        if self.policy == 'reject':
+            raise TaskQueueFull(f'Background task queue is full ({self.max_queue} pending)')
+        return None
+
+    def _done(self, name, future):
+        if future.cancelled():
+            self._finish(name, 'cancelled')
+            return
+        error = future.exception()
+        if error is not None:
+            self._finish(name, 'failed')
+            self._log_failure(name, error)
+        else:
+            self._finish(name, 'completed', future.result())
+
+    def _finish(self, name, outcome, duration=None, pending=True):
+        with self._state:
+            if pending:
+                self.pending -= 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if duration is not None:
+                histogram = self.durations.get(name)
+                if histogram is None:
+                    histogram = self.durations[name] = Histogram()
+                histogram.observe(duration)
+            self._state.notify_all()
+
+    def _log_failure(self, name, error):
+        lines = traceback.format_exception(type(error), error, error.__traceback__)
+        sys.stderr.write(f'Background task {name} failed:\n{"".join(lines)}')
+
+    def log_dropped(self, func):
+        sys.stderr.write(f'Background task {_task_name(func)} dropped: queue is full ({self.max_queue} pending)\n')
+
+    def every(self, interval, func, *args, **kwargs):
+        with self._state:
+            self._periodic.append([time.monotonic() + interval, interval, func, args, kwargs])
+        return func
+
+    def start(self):
+        with self._state:
+            if self._periodic and self._scheduler is None:
+                self._stop.clear()
+                self._scheduler = threading.Thread(target=self._schedule, name='hej-scheduler', daemon=True)
+                self._scheduler.start()
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._state:
+                periodic = list(self._periodic)
+            for entry in periodic:
+                if entry[0] <= now:
+                    entry[0] = now + entry[1]
+                    try:
+                        self.submit(entry[2], *entry[3], **entry[4])
+                    except TaskQueueFull:
+                        self.log_dropped(entry[2])
+            self._stop.wait(max(0, min(entry[0] for entry in periodic) - time.monotonic()))
+
+    def snapshot(self):
+        with self._state:
+            durations = {name: histogram.copy() for name, histogram in self.durations.items()}
+            return {'pending': self.pending, 'outcomes': dict(self.outcomes), 'durations': durations}
+
+    def shutdown(self, timeout=None):
+        self._stop.set()
+        scheduler, self._scheduler = self._scheduler, None
+        if scheduler is not None:
+            scheduler.join(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._state:
+            while self.pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._state.wait(remaining)
+            drained = not self.pending
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=drained)
+        return drained
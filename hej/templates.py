@@ -0,0 +1,62 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+PLACEHOLDER = re.compile(r'\{\{ (.+?) \}\}')
+
+
+class Template:
+    def __init__(self, source: str):
+        self.source = source
+        self._pieces = []
+        self._slots = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            self._pieces.append(source[position:match.start()])
+            self._slots.append((len(self._pieces), match.group(1)))
+            self._pieces.append(match.group(0))
+            position = match.end()
+        self._pieces.append(source[position:])
+
+    def render(self, context: dict = None):
+        if not context or not self._slots:
+            return self.source
+        pieces = list(self._pieces)
+        for index, name in self._slots:
+            if name in context:
+                pieces[index] = str(context[name])
+        return ''.join(pieces)
+
+
+class TemplateLoader:
+    def __init__(self, directory: str, max_size: int = 128):
+        self.directory = directory
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Template:
+        path = os.path.join(self.directory, name)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(path)
+                return entry[1]
+        with open(path) as f:
+            template = Template(f.read())
+        with self._lock:
+            self._cache[path] = (version, template)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return template
+
+    def render(self, name: str, context: dict = None):
+        return self.get(name).render(context)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
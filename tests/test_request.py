@@ -0,0 +1,169 @@
+import io
+import unittest
+
+from hej.request import BodyReader, Request, RequestError, RequestTooLarge, parse_multipart
+
+
+class Trickle(io.BytesIO):
+    def __init__(self, data, step=7):
+        super().__init__(data)
+        self.step = step
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.step:
+            size = self.step
+        return super().read(size)
+
+
+def chunked(*chunks, trailer=b''):
+    return b''.join(b'%x\r\n%s\r\n' % (len(chunk), chunk) for chunk in chunks) + b'0\r\n' + trailer + b'\r\n'
+
+
+class BodyReaderTest(unittest.TestCase):
+    def test_content_length(self):
+        reader = BodyReader(io.BytesIO(b'hello world'), 5)
+        self.assertEqual(reader.read(), b'hello')
+        self.assertTrue(reader.done)
+        self.assertEqual(reader.read(), b'')
+
+    def test_truncated_body(self):
+        reader = BodyReader(io.BytesIO(b'abc'), 10)
+        with self.assertRaises(RequestError):
+            reader.read()
+
+    def test_chunked(self):
+        reader = BodyReader(Trickle(chunked(b'hello ', b'chunked ', b'world') + b'NEXT'), chunked=True)
+        self.assertEqual(reader.read(), b'hello chunked world')
+        self.assertTrue(reader.done)
+        self.assertEqual(reader.stream.read(), b'NEXT')
+
+    def test_chunk_extensions_and_trailers(self):
+        body = b'5;name=value\r\nhello\r\n0\r\nX-Checksum: abc\r\n\r\nNEXT'
+        reader = BodyReader(io.BytesIO(body), chunked=True)
+        self.assertEqual(reader.read(), b'hello')
+        self.assertEqual(reader.stream.read(), b'NEXT')
+
+    def test_malformed_chunk_size(self):
+        for body in (b'zz\r\nhello\r\n0\r\n\r\n', b'5', b'5\r\nhel'):
+            with self.subTest(body=body), self.assertRaises(RequestError):
+                BodyReader(io.BytesIO(body), chunked=True).read()
+
+    def test_oversized_chunk_line(self):
+        with self.assertRaises(RequestError):
+            BodyReader(io.BytesIO(b'1' * 4096 + b'\r\n'), chunked=True).read()
+
+    def test_max_size(self):
+        reader = BodyReader(io.BytesIO(chunked(b'a' * 10, b'b' * 10)), chunked=True, max_size=15)
+        with self.assertRaises(RequestTooLarge):
+            reader.read()
+
+    def test_drain_limit(self):
+        self.assertTrue(BodyReader(io.BytesIO(b'x' * 100), 100).drain(1000))
+        self.assertFalse(BodyReader(Trickle(b'x' * 100), 100).drain(10))
+
+
+class RequestTest(unittest.TestCase):
+    def test_invalid_headers(self):
+        for headers in ({'Content-Length': 'abc'}, {'Content-Length': '-1'}, {'Transfer-Encoding': 'gzip'}):
+            with self.subTest(headers=headers), self.assertRaises(RequestError):
+                Request('POST', '/', headers, io.BytesIO())
+
+    def test_declared_length_over_limit(self):
+        with self.assertRaises(RequestTooLarge):
+            Request('POST', '/', {'Content-Length': '100'}, io.BytesIO(), max_body_size=10)
+
+    def test_chunked_json(self):
+        request = Request('POST', '/', {'Transfer-Encoding': 'chunked'}, io.BytesIO(chunked(b'{"a":', b' 1}')))
+        self.assertEqual(request.json, {'a': 1})
+
+    def test_invalid_json(self):
+        request = Request('POST', '/', {'Content-Length': '4'}, io.BytesIO(b'{"a"'))
+        with self.assertRaises(RequestError):
+            request.json
+
+    def test_urlencoded_form(self):
+        body = b'a=1&b=&c=%C3%A9'
+        request = Request('POST', '/?q=x', {'Content-Length': str(len(body)),
+                                            'Content-Type': 'application/x-www-form-urlencoded'}, io.BytesIO(body))
+        self.assertEqual(request.form, {'a': '1', 'b': '', 'c': '\u00e9'})
+        self.assertEqual(request.args, {'q': 'x'})
+
+
+def multipart(boundary, *parts, preamble=b'', epilogue=b''):
+    body = preamble
+    for headers, content in parts:
+        body += b'--' + boundary + b'\r\n' + headers + b'\r\n\r\n' + content + b'\r\n'
+    return body + b'--' + boundary + b'--\r\n' + epilogue
+
+
+class MultipartTest(unittest.TestCase):
+    boundary = b'----hejboundary'
+
+    def parse(self, body, step=None, max_memory_size=1024, max_parts=1000):
+        stream = io.BytesIO(body) if step is None else Trickle(body, step)
+        reader = BodyReader(stream, len(body))
+        return parse_multipart(reader, self.boundary.decode(), max_memory_size, max_parts)
+
+    def test_fields_and_files(self):
+        body = multipart(self.boundary,
+                         (b'Content-Disposition: form-data; name="title"', b'Hello'),
+                         (b'Content-Disposition: form-data; name="file"; filename="C:\\\\tmp\\\\a.txt"\r\n'
+                          b'Content-Type: text/plain', b'line one\r\nline two'),
+                         preamble=b'ignored preamble\r\n', epilogue=b'ignored epilogue')
+        fields, files = self.parse(body)
+        self.assertEqual(fields, {'title': 'Hello'})
+        upload = files['file']
+        self.assertEqual((upload.filename, upload.content_type, upload.size), ('a.txt', 'text/plain', 18))
+        self.assertEqual(upload.read(), b'line one\r\nline two')
+        upload.close()
+
+    def test_boundary_split_across_reads(self):
+        content = b'x' * 50 + b'\r\n--' + self.boundary[:-1] + b'X' + b'y' * 50
+        body = multipart(self.boundary, (b'Content-Disposition: form-data; name="a"', content),
+                         (b'Content-Disposition: form-data; name="b"', b'second'))
+        for step in (1, 3, 7, 16, 61):
+            with self.subTest(step=step):
+                fields, _ = self.parse(body, step)
+                self.assertEqual(fields, {'a': content.decode(), 'b': 'second'})
+
+    def test_large_file_spools(self):
+        content = bytes(range(256)) * 64
+        body = multipart(self.boundary, (b'Content-Disposition: form-data; name="f"; filename="b.bin"', content))
+        _, files = self.parse(body, step=1000, max_memory_size=100)
+        self.assertEqual(files['f'].read(), content)
+        files['f'].close()
+
+    def test_oversized_field(self):
+        body = multipart(self.boundary, (b'Content-Disposition: form-data; name="a"', b'x' * 2000))
+        with self.assertRaises(RequestTooLarge):
+            self.parse(body, max_memory_size=1000)
+
+    def test_part_limit(self):
+        parts = [(b'Content-Disposition: form-data; name="f%d"' % i, b'v') for i in range(5)]
+        with self.assertRaises(RequestTooLarge):
+            self.parse(multipart(self.boundary, *parts), max_parts=4)
+        fields, _ = self.parse(multipart(self.boundary, *parts), max_parts=5)
+        self.assertEqual(len(fields), 5)
+
+    def test_oversized_part_headers(self):
+        body = b'--' + self.boundary + b'\r\nX-Filler: ' + b'a' * 20000 + b'\r\n\r\nv\r\n--' + self.boundary + b'--\r\n'
+        with self.assertRaises(RequestError):
+            self.parse(body)
+
+    def test_missing_boundary(self):
+        with self.assertRaises(RequestError):
+            self.parse(b'no boundary here at all')
+
+    def test_unterminated_body(self):
+        body = b'--' + self.boundary + b'\r\nContent-Disposition: form-data; name="a"\r\n\r\nvalue without end'
+        with self.assertRaises(RequestError):
+            self.parse(body)
+
+    def test_request_requires_boundary(self):
+        request = Request('POST', '/', {'Content-Type': 'multipart/form-data', 'Content-Length': '0'}, io.BytesIO())
+        with self.assertRaises(RequestError):
+            request.form
+
+
+if __name__ == '__main__':
+    unittest.main()
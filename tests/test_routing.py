@@ -0,0 +1,99 @@
+import unittest
+import uuid
+
+from hej.routing import Router, openapi_path, parse_pattern
+
+
+def router(*routes):
+    result = Router()
+    for method, pattern in routes:
+        result.add(method, pattern, f'{method} {pattern}')
+    return result
+
+
+class PatternTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_pattern('/users/<int:id>/<name>'), [(None, 'users'), ('int', 'id'), ('str', 'name')])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_pattern('/a/<bogus:x>')
+        with self.assertRaises(ValueError):
+            parse_pattern('/a/<path:rest>/b')
+
+    def test_openapi_path(self):
+        path, parameters = openapi_path('/users/<int:id>')
+        self.assertEqual(path, '/users/{id}')
+        self.assertEqual(parameters[0]['schema'], {'type': 'integer'})
+
+
+class ResolveTest(unittest.TestCase):
+    def test_static_and_params(self):
+        r = router(('GET', '/'), ('GET', '/users/<int:id>'), ('GET', '/users/<name>'))
+        self.assertEqual(r.resolve('GET', '/').handler, 'GET /')
+        match = r.resolve('GET', '/users/42')
+        self.assertEqual((match.handler, match.params), ('GET /users/<int:id>', {'id': 42}))
+        match = r.resolve('GET', '/users/bob')
+        self.assertEqual((match.handler, match.params), ('GET /users/<name>', {'name': 'bob'}))
+
+    def test_converter_priority(self):
+        r = router(('GET', '/v/<str:s>'), ('GET', '/v/<uuid:u>'), ('GET', '/v/<float:f>'), ('GET', '/v/<int:i>'))
+        value = uuid.uuid4()
+        self.assertEqual(r.resolve('GET', '/v/7').params, {'i': 7})
+        self.assertEqual(r.resolve('GET', '/v/7.5').params, {'f': 7.5})
+        self.assertEqual(r.resolve('GET', f'/v/{value}').params, {'u': value})
+        self.assertEqual(r.resolve('GET', '/v/abc').params, {'s': 'abc'})
+
+    def test_static_beats_param(self):
+        r = router(('GET', '/users/me'), ('GET', '/users/<name>'))
+        self.assertEqual(r.resolve('GET', '/users/me').handler, 'GET /users/me')
+        self.assertEqual(r.resolve('GET', '/users/you').handler, 'GET /users/<name>')
+
+    def test_backtracking(self):
+        r = router(('GET', '/a/<x>/c'), ('GET', '/a/b/d'), ('GET', '/<path:rest>'))
+        match = r.resolve('GET', '/a/b/c')
+        self.assertEqual((match.handler, match.params), ('GET /a/<x>/c', {'x': 'b'}))
+        self.assertEqual(r.resolve('GET', '/a/b/d').handler, 'GET /a/b/d')
+        match = r.resolve('GET', '/a/b/e')
+        self.assertEqual((match.handler, match.params), ('GET /<path:rest>', {'rest': 'a/b/e'}))
+
+    def test_backtracking_pops_values(self):
+        r = router(('GET', '/<int:a>/x'), ('GET', '/<b>/y'))
+        self.assertEqual(r.resolve('GET', '/1/y').params, {'b': '1'})
+
+    def test_path_converter(self):
+        r = router(('GET', '/files/<path:name>'))
+        self.assertEqual(r.resolve('GET', '/files/a/b%20c.txt').params, {'name': 'a/b c.txt'})
+        self.assertIsNone(r.resolve('GET', '/files/').handler)
+
+    def test_unquoted_params(self):
+        r = router(('GET', '/tags/<tag>'))
+        self.assertEqual(r.resolve('GET', '/tags/c%2B%2B').params, {'tag': 'c++'})
+
+    def test_not_found(self):
+        match = router(('GET', '/a')).resolve('GET', '/b')
+        self.assertEqual((match.handler, match.allowed), (None, ()))
+
+    def test_method_not_allowed(self):
+        match = router(('GET', '/a'), ('POST', '/a')).resolve('DELETE', '/a')
+        self.assertEqual((match.handler, match.allowed), (None, ('GET', 'HEAD', 'POST')))
+
+    def test_head_falls_back_to_get(self):
+        match = router(('GET', '/a')).resolve('HEAD', '/a')
+        self.assertEqual((match.handler, match.method), ('GET /a', 'GET'))
+
+    def test_method_mismatch_backtracks_to_param(self):
+        r = router(('POST', '/users/me'), ('GET', '/users/<name>'))
+        match = r.resolve('GET', '/users/me')
+        self.assertEqual((match.handler, match.params), ('GET /users/<name>', {'name': 'me'}))
+        self.assertEqual(r.resolve('POST', '/users/me').handler, 'POST /users/me')
+        self.assertEqual(r.resolve('PUT', '/users/me').allowed, ('GET', 'HEAD', 'POST'))
+
+    def test_method_mismatch_backtracks_to_path(self):
+        r = router(('PUT', '/files/a'), ('DELETE', '/files/<path:p>'))
+        self.assertEqual(r.resolve('DELETE', '/files/a').params, {'p': 'a'})
+        self.assertEqual(r.resolve('GET', '/files/a').allowed, ('DELETE', 'PUT'))
+
+
+if __name__ == '__main__':
+    unittest.main()
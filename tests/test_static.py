@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from hej.static import IMMUTABLE, StaticFiles, parse_range
+
+
+class ParseRangeTest(unittest.TestCase):
+    def test_satisfiable(self):
+        for value, expected in [('bytes=0-9', (0, 9)), ('bytes=10-', (10, 99)), ('bytes=-10', (90, 99)),
+                                ('bytes=90-200', (90, 99)), ('bytes=-500', (0, 99)), (' bytes = 5 - 6 ', (5, 6))]:
+            with self.subTest(value=value):
+                self.assertEqual(parse_range(value, 100), expected)
+
+    def test_ignored(self):
+        for value in ('items=0-9', 'bytes=0-1,5-6', 'bytes=abc', 'bytes=-', 'bytes=5', 'bytes=+1-2',
+                      'bytes=1_0-20', 'bytes=¹-2', 'bytes=9-5'):
+            with self.subTest(value=value):
+                self.assertIs(parse_range(value, 100), False)
+
+    def test_unsatisfiable(self):
+        for value, size in [('bytes=100-', 100), ('bytes=200-300', 100), ('bytes=-0', 100), ('bytes=-5', 0),
+                            ('bytes=0-', 0)]:
+            with self.subTest(value=value, size=size):
+                self.assertIsNone(parse_range(value, size))
+
+
+class StaticFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, 'public')
+        os.makedirs(os.path.join(self.root, 'css'))
+        self.write(os.path.join(self.root, 'css', 'site.css'), b'body{}')
+        self.write(os.path.join(self.root, 'app.3f2a9c1b.js'), b'x' * 100)
+        self.write(os.path.join(self.tmp.name, 'secret.txt'), b'secret')
+        self.static = StaticFiles(self.root)
+
+    @staticmethod
+    def write(path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def symlink(self, target, name):
+        try:
+            os.symlink(target, os.path.join(self.root, name))
+        except (OSError, NotImplementedError):
+            self.skipTest('symlinks not supported')
+
+    def test_resolve(self):
+        self.assertEqual(self.static.resolve('css/site.css'), os.path.join(self.static.directory, 'css', 'site.css'))
+        self.assertEqual(self.static.resolve('css/site%2Ecss'), os.path.join(self.static.directory, 'css', 'site.css'))
+
+    def test_traversal(self):
+        for relpath in ('../secret.txt', 'css/../../secret.txt', '%2e%2e/secret.txt', '%2E%2E%2Fsecret.txt',
+                        './css/site.css', 'css//site.css', 'css/', '..\\secret.txt', '..%5csecret.txt',
+                        'css/site.css%00.png', ''):
+            with self.subTest(relpath=relpath):
+                self.assertIsNone(self.static.resolve(relpath))
+
+    def test_symlink_escape(self):
+        self.symlink(os.path.join(self.tmp.name, 'secret.txt'), 'leak.txt')
+        self.symlink(self.tmp.name, 'up')
+        self.assertIsNone(self.static.resolve('leak.txt'))
+        self.assertIsNone(self.static.resolve('up/secret.txt'))
+        self.assertEqual(self.static.open('leak.txt'), (None, None))
+
+    def test_symlink_inside_root(self):
+        self.symlink(os.path.join(self.root, 'css'), 'styles')
+        f, static = self.static.open('styles/site.css')
+        self.addCleanup(f.close)
+        self.assertEqual(f.read(), b'body{}')
+        self.assertEqual(static.content_type, 'text/css; charset=utf-8')
+
+    def test_open_directory(self):
+        self.assertEqual(self.static.open('css'), (None, None))
+        self.assertEqual(self.static.open('missing.txt'), (None, None))
+
+    def test_cache_control(self):
+        self.assertEqual(self.static.cache_control('app.3f2a9c1b.js'), IMMUTABLE)
+        self.assertEqual(self.static.cache_control('app-3F2A9C1B0D.min.css'), IMMUTABLE)
+        self.assertEqual(self.static.cache_control('logo.png'), 'no-cache')
+        self.assertEqual(self.static.cache_control('deadbeefcafe.js'), 'no-cache')
+        self.assertEqual(self.static.cache_control('build.12345678.js'), 'no-cache')
+        self.assertEqual(StaticFiles(self.root, max_age=60).cache_control('logo.png'), 'public, max-age=60')
+
+    def test_range_responses(self):
+        f, static = self.static.open('app.3f2a9c1b.js')
+        f.close()
+        status, start, length, headers = StaticFiles.prepare(static, {'range': 'bytes=10-19'})
+        self.assertEqual((status, start, length, headers['Content-Range']), (206, 10, 10, 'bytes 10-19/100'))
+        status, _, length, headers = StaticFiles.prepare(static, {'range': 'bytes=100-'})
+        self.assertEqual((status, length, headers['Content-Range']), (416, 0, 'bytes */100'))
+        status, _, length, _ = StaticFiles.prepare(static, {'range': 'bytes=5-1'})
+        self.assertEqual((status, length), (200, 100))
+        status, _, length, _ = StaticFiles.prepare(static, {'range': 'bytes=0-9', 'if-range': '"stale"'})
+        self.assertEqual((status, length), (200, 100))
+        status, _, length, _ = StaticFiles.prepare(static, {'range': 'bytes=0-9', 'if-range': static.etag})
+        self.assertEqual((status, length), (206, 10))
+
+    def test_conditional(self):
+        f, static = self.static.open('css/site.css')
+        f.close()
+        self.assertEqual(StaticFiles.prepare(static, {'if-none-match': static.etag})[0], 304)
+        self.assertEqual(StaticFiles.prepare(static, {'if-modified-since': static.last_modified})[0], 304)
+        self.assertEqual(StaticFiles.prepare(static, {'if-none-match': '"other"'})[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from hej.stylesheet import merge, minify, parse
+
+
+class ParseTest(unittest.TestCase):
+    def test_declarations(self):
+        rules = parse('/* note */ .a > .b { Color : red ; padding: 0 1px }')
+        self.assertEqual(rules, [('.a>.b', {'color': 'red', 'padding': '0 1px'})])
+
+    def test_custom_properties_keep_case(self):
+        self.assertEqual(parse(':root{--Main: #fff}'), [(':root', {'--Main': '#fff'})])
+
+    def test_strings_and_functions(self):
+        rules = parse('.a{content:"a;  b";background:url(x;y.png)}')
+        self.assertEqual(rules, [('.a', {'content': '"a;  b"', 'background': 'url(x;y.png)'})])
+
+    def test_at_rules(self):
+        self.assertEqual(parse('@import "x.css";'), [(None, '@import "x.css";')])
+        self.assertEqual(parse('@media (max-width: 10px) { .a { color: red } .a { margin: 0 } }'),
+                         [(None, '@media (max-width: 10px){.a{color:red;margin:0}}')])
+
+    def test_duplicate_declaration_keeps_last(self):
+        self.assertEqual(parse('.a{color:red;margin:0;color:blue}'), [('.a', {'margin': '0', 'color': 'blue'})])
+
+
+class MergeTest(unittest.TestCase):
+    def test_adjacent_duplicates(self):
+        rules = merge(parse('.a{color:red} .a{margin:0}'))
+        self.assertEqual(rules, [('.a', {'color': 'red', 'margin': '0'})])
+
+    def test_unrelated_rule_between(self):
+        rules = merge(parse('.a{color:red} .b{margin:0} .a{padding:0}'))
+        self.assertEqual(rules, [('.a', {'color': 'red', 'padding': '0'}), ('.b', {'margin': '0'})])
+
+    def test_same_property_between(self):
+        css = '.a{color:red} .b{color:blue} .a{color:green}'
+        self.assertEqual(minify(css), '.a{color:red}.b{color:blue}.a{color:green}')
+
+    def test_shorthand_between(self):
+        self.assertEqual(minify('.a{color:red} .b{padding:0} .a{padding-left:5px}'),
+                         '.b{padding:0}.a{color:red;padding-left:5px}')
+
+    def test_shorthand_on_both_sides(self):
+        self.assertEqual(minify('.a{padding:0} .b{padding-left:1px} .a{padding-left:5px}'),
+                         '.a{padding:0}.b{padding-left:1px}.a{padding-left:5px}')
+
+    def test_families(self):
+        for first, between, last in [('margin', 'margin-top', 'margin-bottom'),
+                                     ('border-color', 'border', 'border-top-width'),
+                                     ('font-size', 'font', 'line-height'),
+                                     ('background-image', 'background', 'background-color'),
+                                     ('top', 'inset', 'left'),
+                                     ('align-items', 'place-items', 'justify-items'),
+                                     ('row-gap', 'gap', 'column-gap'),
+                                     ('column-width', 'columns', 'column-count'),
+                                     ('transition-delay', '-webkit-transition', 'transition-duration'),
+                                     ('color', 'all', 'margin')]:
+            css = f'.a{{{first}:1}} .b{{{between}:2}} .a{{{last}:3}}'
+            self.assertEqual(minify(css), css.replace(' ', ''), css)
+
+    def test_custom_properties_match_exactly(self):
+        self.assertEqual(minify('.a{--x:1} .b{--x-y:2} .a{--x-z:3}'), '.a{--x:1;--x-z:3}.b{--x-y:2}')
+        self.assertEqual(minify('.a{--x:1} .b{--x:2} .a{--y:3}'), '.a{--x:1;--y:3}.b{--x:2}')
+
+    def test_at_rule_between_stops_merge(self):
+        self.assertEqual(minify('.a{color:red} @media print{.b{margin:0}} .a{padding:0}'),
+                         '.a{color:red}@media print{.b{margin:0}}.a{padding:0}')
+
+
+class MinifyTest(unittest.TestCase):
+    def test_whitespace_and_comments(self):
+        self.assertEqual(minify('''
+            /* header */
+            body ,  html {
+                margin : 0 ;
+                font-family : "Segoe  UI" , sans-serif ;
+            }
+        '''), 'body,html{margin:0;font-family:"Segoe  UI",sans-serif}')
+
+    def test_empty_rules_dropped(self):
+        self.assertEqual(minify('.a{} .b{color:red}'), '.b{color:red}')
+
+
+if __name__ == '__main__':
+    unittest.main()